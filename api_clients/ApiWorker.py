@@ -1,69 +1,165 @@
+import dataclasses
 import logging
 import threading, queue
-from dataclasses import dataclass
-from enum import Enum
-from typing import Any
+import time
 
-import requests
-
-from api_clients.students import fetch_active_entry, close_entry, add_entry
+from api_clients.client import client
+from api_clients.entry_cache import EntryCache
+from api_clients.jobs import ApiJob, ApiJobQueue, ApiJobType
+from api_clients.journal import EntryJournal, JournalReplayer, ADD_ENTRY, CLOSE_ENTRY
+from api_clients.resilience import CircuitOpenError
+from api_clients.students import fetch_active_entry
+from diagnostics.metrics import API_JOB_QUEUE_SECONDS, API_JOB_SECONDS, API_JOB_ERRORS
+from diagnostics.profiler import HEARTBEATS
 from obj.objects import Message, MessageType
 
-
-class ApiJobType(Enum):
-    FETCH_ACTIVE_ENTRY = "fetch_active_entry" # payload: card_id
-    ADD_ENTRY = "add_entry" # payload: ws_id, student_id
-    CLOSE_ENTRY = "close_entry" # payload: entry_id
-
-@dataclass(frozen=True)
-class ApiJob:
-    type: ApiJobType
-    payload: Any # card_id or entry_id or workstation_id depending on job type
+JOB_DEADLINE = 30 # s a job may run before the watchdog reports the worker, above every request budget
 
 class ApiWorker(threading.Thread):
-    def __init__(self, events: queue.Queue, api_events: queue.Queue, stop_event: threading.Event):
-        super().__init__()
+    def __init__(self, events: queue.Queue, api_events: ApiJobQueue, stop_event: threading.Event,
+                 journal: EntryJournal, replayer: JournalReplayer, cache: EntryCache, index: int = 0):
+        super().__init__(name=f"ApiWorker-{index}")
         self.logger = logging.getLogger("API_WORKER")
         self.events = events
         self.api_events = api_events
         self.stop_event = stop_event
+        self.journal = journal
+        self.replayer = replayer
+        self.cache = cache
+        self.index = index
 
     def run(self):
+        if self.index == 0:
+            client.warm_up()
         while not self.stop_event.is_set():
+            HEARTBEATS.beat(JOB_DEADLINE)
             try:
                 event = self.api_events.get(timeout=0.2)
-                self.handle_event(event)
             except queue.Empty:
                 continue
+            API_JOB_QUEUE_SECONDS.observe(time.monotonic() - event.created_at, event.type.value)
+            start = time.perf_counter()
+            try:
+                self.handle_event(event)
+            finally:
+                self.api_events.done(event)
+                API_JOB_SECONDS.observe(time.perf_counter() - start, event.type.value)
+        if self.index == 0:
+            for line in client.report():
+                self.logger.info(f"API latency {line}")
         self.logger.info("ApiWorker stopped.")
 
+    def emit(self, job: ApiJob, message: Message):
+        if job.expired:
+            self.logger.warning(f"Dropping {message.type}, {job.type} missed its deadline.")
+            return
+        if isinstance(message.payload, Message):
+            message = dataclasses.replace(message, payload=dataclasses.replace(message.payload, reader_id=job.reader_id))
+        self.events.put(dataclasses.replace(message, reader_id=job.reader_id))
+
     def handle_event(self, event: ApiJob):
-        self.logger.debug(f"Handling event: {event.type}")
+        self.logger.debug("Handling event: %s", event.type)
+        if event.expired:
+            self.logger.warning(f"Dropping {event.type} job, it expired while queued.")
+            return
         try:
             if event.type == ApiJobType.FETCH_ACTIVE_ENTRY:
-                response = fetch_active_entry(event.payload)
-                response.raise_for_status()
-                response = response.json()
-                self.logger.debug(f"API Response: {response}")
-                self.logger.info("Fetched active entry from API successfully. CODE: " + response["code"])
-                if response["code"] == "STUDENT_NOT_FOUND":
-                    self.events.put(Message(MessageType.API_STUDENT_NOT_FOUND))
-                elif response["code"] == "STUDENT_REQUIRES_RENEWAL":
-                    self.events.put(Message(MessageType.API_STUDENT_REQUIRES_RENEWAL))
-                elif response["code"] == "CARD_ASSIGNING":
-                    self.events.put(Message(MessageType.API_CARD_ASSIGNING))
-                elif response["code"] == "NO_ACTIVE_ENTRY":
-                    self.events.put(Message(MessageType.API_NO_ACTIVE_ENTRY, response["student"]["istId"]))
-                elif response["code"] == "ACTIVE_ENTRY_FOUND":
-                    self.events.put(Message(MessageType.API_ACTIVE_ENTRY_FOUND, response["entry"]["id"]))
+                self.handle_fetch_active_entry(event)
             elif event.type == ApiJobType.ADD_ENTRY:
-                response = add_entry(event.payload["student_id"], event.payload["ws_id"])
-                response.raise_for_status()
-                self.logger.info("Added entry to API successfully.")
+                # Entry mutations are written ahead to the journal and sent to the API by the replayer
+                self.journal.append(ADD_ENTRY, {**event.payload, "reader_id": event.reader_id})
+                self.cache.on_entry_added(event.payload["student_id"])
+                self.replayer.wake()
             elif event.type == ApiJobType.CLOSE_ENTRY:
-                response = close_entry(event.payload)
-                response.raise_for_status()
-                self.logger.info("Closed entry from API successfully.")
+                card_id = event.payload["card_id"]
+                self.cache.wait_revalidation(card_id)
+                if self.cache.consume_retraction(card_id):
+                    self.logger.warning("Skipping close of a stale cached entry.")
+                    return
+                self.journal.append(CLOSE_ENTRY, {**event.payload, "reader_id": event.reader_id})
+                self.cache.on_entry_closed(event.payload["entry_id"], card_id)
+                self.replayer.wake()
+        except CircuitOpenError as err:
+            self.logger.error(f"Failed to execute API job, {err}")
+            API_JOB_ERRORS.inc(event.type.value, type(err).__name__)
+            card_id = event.payload if event.type == ApiJobType.FETCH_ACTIVE_ENTRY else None
+            self.emit(event, Message(MessageType.API_UNAVAILABLE, card_id=card_id))
         except Exception as err:
             self.logger.error(f"Failed to execute API job with error: {err}")
-            self.events.put(Message(MessageType.API_ERROR))
\ No newline at end of file
+            API_JOB_ERRORS.inc(event.type.value, type(err).__name__)
+            card_id = event.payload if event.type == ApiJobType.FETCH_ACTIVE_ENTRY else None
+            self.emit(event, Message(MessageType.API_ERROR, card_id=card_id))
+
+    def handle_fetch_active_entry(self, job: ApiJob):
+        card_id = job.payload
+        self.cache.consume_retraction(card_id)
+        cached = self.cache.get(card_id)
+        if cached is None:
+            self.emit(job, self.fetch_active_entry(card_id))
+            return
+
+        # Answer from the cache right away and revalidate with the server behind the GUI's back. The revalidation is
+        # registered before the answer goes out, so a close queued in reply to it waits for the verdict.
+        cached_message = cached.to_message(card_id)
+        # While the API has not seen our latest check-ins/check-outs it cannot contradict the cache
+        if self.journal.has_pending():
+            self.logger.info(f"Served {cached_message.type} from cache.")
+            self.emit(job, cached_message)
+            return
+        self.cache.begin_revalidation(card_id)
+        self.logger.info(f"Served {cached_message.type} from cache, revalidating with API.")
+        self.emit(job, cached_message)
+        try:
+            message = self.fetch_active_entry(card_id)
+            if not cached.matches(message):
+                self.logger.warning(f"Cached entry was stale, API answered {message.type}. Sending correction.")
+                if cached_message.type == MessageType.API_ACTIVE_ENTRY_FOUND:
+                    self.cache.retract(card_id)
+                self.emit(job, Message(MessageType.API_CACHE_CORRECTION, message, card_id=card_id))
+        except Exception as err:
+            self.logger.warning(f"Failed to revalidate cached entry with error: {err}")
+        finally:
+            self.cache.end_revalidation(card_id)
+
+    def fetch_active_entry(self, card_id: int) -> Message:
+        response = fetch_active_entry(card_id)
+        response.raise_for_status()
+        response = response.json()
+        self.logger.debug("API Response: %s", response)
+        self.logger.info("Fetched active entry from API successfully. CODE: " + response["code"])
+
+        student_id = (response.get("student") or {}).get("istId")
+        if student_id is None and (cached := self.cache.get(card_id)) is not None:
+            student_id = cached.student_id
+
+        if response["code"] == "NO_ACTIVE_ENTRY":
+            self.cache.put(card_id, student_id, False)
+            return Message(MessageType.API_NO_ACTIVE_ENTRY, student_id, card_id=card_id)
+        if response["code"] == "ACTIVE_ENTRY_FOUND":
+            if student_id is not None:
+                self.cache.put(card_id, student_id, True, response["entry"]["id"])
+            return Message(MessageType.API_ACTIVE_ENTRY_FOUND, response["entry"]["id"], card_id=card_id)
+
+        self.cache.invalidate(card_id)
+        if response["code"] == "STUDENT_NOT_FOUND":
+            return Message(MessageType.API_STUDENT_NOT_FOUND, card_id=card_id)
+        if response["code"] == "STUDENT_REQUIRES_RENEWAL":
+            return Message(MessageType.API_STUDENT_REQUIRES_RENEWAL, card_id=card_id)
+        if response["code"] == "CARD_ASSIGNING":
+            return Message(MessageType.API_CARD_ASSIGNING, card_id=card_id)
+        raise ValueError("Unexpected active entry code: " + response["code"])
+
+class ApiWorkerPool:
+    def __init__(self, events: queue.Queue, api_events: ApiJobQueue, stop_event: threading.Event,
+                 journal: EntryJournal, replayer: JournalReplayer, size: int):
+        self.cache = EntryCache()
+        self.workers = [ApiWorker(events, api_events, stop_event, journal, replayer, self.cache, index)
+                        for index in range(size)]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def join(self, timeout: float | None = None):
+        for worker in self.workers:
+            worker.join(timeout)
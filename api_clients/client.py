@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api_clients.resilience import CircuitBreaker, RequestPolicy, ResilientCaller
+from diagnostics.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+from config import BASE_API_URL, HTTP_POOL_SIZE, API_WORKERS
+
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_POLICY = RequestPolicy(timeout=DEFAULT_TIMEOUT, budget=10)
+# Latency budget per endpoint, i.e. per ApiWorker job type and for the workstation poll
+ENDPOINT_POLICIES = {
+    "reader/active-entry": RequestPolicy(timeout=(1.5, 2.5), budget=4, retries=2, hedge_after=0.8),
+    "reader/add-entry": RequestPolicy(timeout=(3.05, 10), budget=10),
+    "reader/close-entry": RequestPolicy(timeout=(3.05, 10), budget=10),
+    "workstations": RequestPolicy(timeout=(3.05, 5), budget=8, retries=1),
+}
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+
+
+class PooledAdapter(HTTPAdapter):
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        pool = self._pool_for(request, verify, cert, proxies)
+        opened = pool.num_connections if pool is not None else None
+        response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        response.reused_connection = pool is not None and pool.num_connections == opened
+        return response
+
+    def _pool_for(self, request, verify, cert, proxies):
+        try:
+            if hasattr(self, "get_connection_with_tls_context"):
+                return self.get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+            return self.get_connection(request.url, proxies)
+        except Exception:
+            return None
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = {True: 0, False: 0}
+        self.total_ms = {True: 0.0, False: 0.0}
+        self.max_ms = {True: 0.0, False: 0.0}
+
+    def record(self, reused: bool, elapsed_ms: float):
+        self.count[reused] += 1
+        self.total_ms[reused] += elapsed_ms
+        self.max_ms[reused] = max(self.max_ms[reused], elapsed_ms)
+
+    def summary(self, reused: bool) -> str:
+        count = self.count[reused]
+        if count == 0:
+            return "-"
+        return f"n={count} avg={self.total_ms[reused] / count:.1f}ms max={self.max_ms[reused]:.1f}ms"
+
+
+class ApiClient:
+    def __init__(self, base_url: str, pool_size: int):
+        self.logger = logging.getLogger("API_CLIENT")
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.session.headers["Connection"] = "keep-alive"
+        adapter = PooledAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Event streams are long-lived, so they get a session of their own instead of holding a pooled connection
+        self.stream_session = requests.Session()
+        self.stats: dict[str, EndpointStats] = {}
+        self.lock = threading.Lock()
+        self.breaker = CircuitBreaker()
+        # Every API worker can have its lookup and that lookup's hedge in flight at once
+        self.caller = ResilientCaller(self.breaker, hedge_workers=API_WORKERS * 2)
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, **kwargs)
+
+    def put(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("PUT", endpoint, **kwargs)
+
+    def request(self, method: str, endpoint: str, path: str = "", **kwargs) -> requests.Response:
+        policy = ENDPOINT_POLICIES.get(endpoint, DEFAULT_POLICY)
+        return self.caller.call(lambda timeout: self._send(method, endpoint, path, timeout, **kwargs),
+                                policy, method in IDEMPOTENT_METHODS)
+
+    def _send(self, method: str, endpoint: str, path: str, timeout: tuple[float, float], **kwargs) -> requests.Response:
+        url = self.base_url + endpoint + path
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
+        except requests.RequestException as err:
+            HTTP_REQUESTS.inc(endpoint, type(err).__name__)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        HTTP_REQUEST_SECONDS.observe(elapsed_ms / 1000, endpoint)
+        HTTP_REQUESTS.inc(endpoint, response.status_code)
+
+        reused = getattr(response, "reused_connection", False)
+        with self.lock:
+            self.stats.setdefault(endpoint, EndpointStats()).record(reused, elapsed_ms)
+        self.logger.debug("%s %s%s -> %s in %.1fms (%s connection)", method, endpoint, path, response.status_code,
+                          elapsed_ms, "reused" if reused else "new")
+        return response
+
+    def stream(self, endpoint: str, read_timeout: float, headers: dict | None = None) -> requests.Response:
+        # Bypasses the retries and circuit breaker: the caller reconnects, or falls back to polling
+        try:
+            response = self.stream_session.get(self.base_url + endpoint, stream=True, headers=headers,
+                                               timeout=(DEFAULT_TIMEOUT[0], read_timeout))
+        except requests.RequestException as err:
+            HTTP_REQUESTS.inc(endpoint, type(err).__name__)
+            raise
+        HTTP_REQUESTS.inc(endpoint, response.status_code)
+        return response
+
+    def warm_up(self):
+        # Opens the TLS connection to the API host ahead of the first card scan
+        start = time.perf_counter()
+        try:
+            self.session.head(self.base_url, timeout=DEFAULT_TIMEOUT)
+            self.logger.info(f"Warmed up API connection in {(time.perf_counter() - start) * 1000:.1f}ms")
+        except requests.RequestException as err:
+            self.logger.warning(f"API connection warm-up failed: {err}")
+
+    def report(self) -> list[str]:
+        with self.lock:
+            return [f"{endpoint}: reused [{stats.summary(True)}] new [{stats.summary(False)}]"
+                    for endpoint, stats in sorted(self.stats.items())]
+
+    def close(self):
+        self.session.close()
+        self.stream_session.close()
+
+
+client = ApiClient(BASE_API_URL, HTTP_POOL_SIZE)
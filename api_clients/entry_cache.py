@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+from obj.objects import Message, MessageType
+
+
+@dataclass
+class CachedEntry:
+    student_id: str
+    active: bool
+    entry_id: int | None # None while the id of an active entry is only known to the server
+    stored_at: float
+
+    def to_message(self, card_id: int | None = None) -> Message:
+        if self.active:
+            return Message(MessageType.API_ACTIVE_ENTRY_FOUND, self.entry_id, card_id=card_id)
+        return Message(MessageType.API_NO_ACTIVE_ENTRY, self.student_id, card_id=card_id)
+
+    def matches(self, message: Message) -> bool:
+        if self.active and self.entry_id is None:
+            return message.type == MessageType.API_ACTIVE_ENTRY_FOUND
+        return message == self.to_message()
+
+
+class EntryCache:
+    def __init__(self, max_size: int = 256, ttl: float = 12 * 60 * 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[int, CachedEntry] = OrderedDict()
+        self.lock = threading.Lock()
+        # Cards whose cached active entry turned out to be stale, so their pending close must be skipped
+        self.retracted: set[int] = set()
+        self.revalidations: dict[int, threading.Event] = {}
+
+    def get(self, card_id: int) -> CachedEntry | None:
+        with self.lock:
+            entry = self.entries.get(card_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.stored_at > self.ttl:
+                del self.entries[card_id]
+                return None
+            self.entries.move_to_end(card_id)
+            return replace(entry)
+
+    def put(self, card_id: int, student_id: str, active: bool, entry_id: int | None = None):
+        with self.lock:
+            self.entries[card_id] = CachedEntry(student_id, active, entry_id, time.monotonic())
+            self.entries.move_to_end(card_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, card_id: int):
+        with self.lock:
+            self.entries.pop(card_id, None)
+
+    def on_entry_added(self, student_id: str, entry_id: int | None = None):
+        with self.lock:
+            for entry in self.entries.values():
+                if entry.student_id == student_id:
+                    entry.active = True
+                    entry.entry_id = entry_id
+                    entry.stored_at = time.monotonic()
+
+    def on_entry_closed(self, entry_id: int | None, card_id: int | None = None):
+        with self.lock:
+            for cached_card_id, entry in self.entries.items():
+                if entry.active and (cached_card_id == card_id or entry_id is not None and entry.entry_id == entry_id):
+                    entry.active = False
+                    entry.entry_id = None
+                    entry.stored_at = time.monotonic()
+
+    def retract(self, card_id: int):
+        with self.lock:
+            self.retracted.add(card_id)
+
+    def consume_retraction(self, card_id: int) -> bool:
+        with self.lock:
+            if card_id in self.retracted:
+                self.retracted.discard(card_id)
+                return True
+            return False
+
+    def begin_revalidation(self, card_id: int):
+        with self.lock:
+            self.revalidations[card_id] = threading.Event()
+
+    def end_revalidation(self, card_id: int):
+        with self.lock:
+            event = self.revalidations.pop(card_id, None)
+        if event is not None:
+            event.set()
+
+    def wait_revalidation(self, card_id: int, timeout: float = 10):
+        with self.lock:
+            event = self.revalidations.get(card_id)
+        if event is not None:
+            event.wait(timeout)
@@ -0,0 +1,66 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+
+class ApiJobType(Enum):
+    FETCH_ACTIVE_ENTRY = "fetch_active_entry" # payload: card_id
+    ADD_ENTRY = "add_entry" # payload: ws_id, student_id
+    CLOSE_ENTRY = "close_entry" # payload: entry_id, card_id
+
+# Lower runs first: interactive lookups beat background writes
+PRIORITIES = {
+    ApiJobType.FETCH_ACTIVE_ENTRY: 0,
+    ApiJobType.CLOSE_ENTRY: 1,
+    ApiJobType.ADD_ENTRY: 1,
+}
+
+@dataclass(frozen=True)
+class ApiJob:
+    type: ApiJobType
+    payload: Any # card_id or entry_id or workstation_id depending on job type
+    deadline: float | None = field(default=None, compare=False) # time.monotonic() after which the answer is stale
+    created_at: float = field(default_factory=time.monotonic, compare=False)
+    reader_id: str | None = field(default=None, compare=False) # reader session that gets the answer
+
+    @property
+    def key(self) -> tuple:
+        if isinstance(self.payload, dict):
+            return self.type, tuple(sorted(self.payload.items()))
+        return self.type, self.payload
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+class ApiJobQueue:
+    def __init__(self):
+        self.logger = logging.getLogger("API_JOB_QUEUE")
+        self.queue = queue.PriorityQueue()
+        self.counter = itertools.count()
+        self.in_flight: set[tuple] = set()
+        self.lock = threading.Lock()
+
+    def put(self, job: ApiJob) -> bool:
+        with self.lock:
+            if job.key in self.in_flight:
+                self.logger.debug("Dropping duplicate %s job.", job.type)
+                return False
+            self.in_flight.add(job.key)
+        self.queue.put((PRIORITIES[job.type], next(self.counter), job))
+        return True
+
+    def get(self, timeout: float | None = None) -> ApiJob:
+        return self.queue.get(timeout=timeout)[2]
+
+    def done(self, job: ApiJob):
+        with self.lock:
+            self.in_flight.discard(job.key)
+
+    def qsize(self) -> int:
+        return self.queue.qsize()
@@ -0,0 +1,177 @@
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import requests
+
+from api_clients.students import add_entry, close_entry, fetch_active_entry
+from diagnostics.metrics import JOURNAL_FAILED
+from diagnostics.profiler import HEARTBEATS
+
+ADD_ENTRY = "add_entry"
+CLOSE_ENTRY = "close_entry"
+REPLAY_DEADLINE = 30 # s a single replay may take before the watchdog reports the replayer
+
+
+@dataclass(frozen=True)
+class JournalRecord:
+    id: int
+    type: str # ADD_ENTRY or CLOSE_ENTRY
+    payload: dict[str, Any]
+    created_at: float # client wall clock time of the check-in/check-out
+    attempts: int
+
+
+class TransientError(Exception):
+    pass
+
+
+class EntryJournal:
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                error TEXT
+            )
+        """)
+
+    def append(self, type: str, payload: dict[str, Any]) -> int:
+        # Committed before returning, so an entry the kiosk already confirmed is on disk however slow the API is
+        with self.lock:
+            cursor = self.conn.execute("INSERT INTO journal (type, payload, created_at) VALUES (?, ?, ?)",
+                                       (type, json.dumps(payload), time.time()))
+            return cursor.lastrowid
+
+    def pending(self) -> list[JournalRecord]:
+        with self.lock:
+            rows = self.conn.execute("SELECT id, type, payload, created_at, attempts FROM journal "
+                                     "WHERE status = 'pending' ORDER BY id").fetchall()
+        return [JournalRecord(row[0], row[1], json.loads(row[2]), row[3], row[4]) for row in rows]
+
+    def has_pending(self) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT EXISTS (SELECT 1 FROM journal WHERE status = 'pending')").fetchone()
+        return bool(row[0])
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM journal WHERE status = 'pending'").fetchone()[0]
+
+    def mark_done(self, record: JournalRecord):
+        with self.lock:
+            self.conn.execute("DELETE FROM journal WHERE id = ?", (record.id,))
+
+    def mark_retry(self, record: JournalRecord, error: str):
+        with self.lock:
+            self.conn.execute("UPDATE journal SET attempts = attempts + 1, error = ? WHERE id = ?",
+                              (error, record.id))
+
+    def mark_failed(self, record: JournalRecord, error: str):
+        with self.lock:
+            self.conn.execute("UPDATE journal SET attempts = attempts + 1, status = 'failed', error = ? "
+                              "WHERE id = ?", (error, record.id))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class JournalReplayer(threading.Thread):
+    def __init__(self, stop_event: threading.Event, journal: EntryJournal,
+                 min_backoff: float = 1, max_backoff: float = 60):
+        super().__init__(name="JournalReplayer")
+        self.logger = logging.getLogger("JOURNAL_REPLAYER")
+        self.stop_event = stop_event
+        self.journal = journal
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff = 0
+        self.retry_at = 0.0
+        self.has_work = True
+        self.wake_event = threading.Event()
+
+    def wake(self):
+        self.wake_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            HEARTBEATS.beat(REPLAY_DEADLINE)
+            if self.wake_event.wait(0.5):
+                self.wake_event.clear()
+                self.has_work = True
+            if self.has_work and time.monotonic() >= self.retry_at:
+                self.drain()
+        self.journal.close()
+        self.logger.info("Journal replayer stopped.")
+
+    def drain(self):
+        for record in self.journal.pending():
+            if self.stop_event.is_set():
+                return
+            HEARTBEATS.beat(REPLAY_DEADLINE)
+            try:
+                self.replay(record)
+            except TransientError as err:
+                self.journal.mark_retry(record, str(err))
+                self.backoff = min(max(self.backoff * 2, self.min_backoff), self.max_backoff)
+                self.retry_at = time.monotonic() + self.backoff * random.uniform(0.5, 1)
+                self.logger.warning(f"API unreachable, retrying journal in {self.backoff}s: {err}")
+                return
+            except Exception as err:
+                self.journal.mark_failed(record, str(err))
+                # Only logged and counted, the reader that queued it has long moved on to other students
+                self.logger.error(f"Dropped journal record {record.id} ({record.type}) with error: {err}")
+                JOURNAL_FAILED.inc(record.type)
+                continue
+
+            self.journal.mark_done(record)
+            self.backoff = 0
+            self.retry_at = 0.0
+        self.has_work = False
+
+    def replay(self, record: JournalRecord):
+        self.logger.debug("Replaying journal record %s (%s) from %s", record.id, record.type, record.created_at)
+        if record.type == ADD_ENTRY:
+            send(lambda: add_entry(record.payload["student_id"], record.payload["ws_id"], record.created_at))
+            self.logger.info("Added entry to API successfully.")
+        elif record.type == CLOSE_ENTRY:
+            entry_id = record.payload["entry_id"]
+            if entry_id is None:
+                entry_id = self.resolve_entry_id(record.payload["card_id"])
+                if entry_id is None:
+                    self.logger.info("Entry was already closed on the API.")
+                    return
+            send(lambda: close_entry(entry_id, record.created_at))
+            self.logger.info("Closed entry from API successfully.")
+
+    def resolve_entry_id(self, card_id: int) -> int | None:
+        # Entries checked in while offline only get an id once their add-entry is replayed
+        response = send(lambda: fetch_active_entry(card_id)).json()
+        if response["code"] == "ACTIVE_ENTRY_FOUND":
+            return response["entry"]["id"]
+        return None
+
+
+def send(call) -> requests.Response:
+    try:
+        response = call()
+    except (requests.ConnectionError, requests.Timeout) as err:
+        raise TransientError(err)
+    if response.status_code == 429 or response.status_code >= 500:
+        raise TransientError(f"HTTP {response.status_code}")
+    response.raise_for_status()
+    return response
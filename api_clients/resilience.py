@@ -0,0 +1,165 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable
+
+import requests
+
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    timeout: tuple[float, float] # (connect, read) of a single attempt
+    budget: float # total seconds across attempts, backoff and hedges
+    retries: int = 0 # extra attempts, only used for idempotent requests
+    hedge_after: float | None = None # seconds before a second, parallel attempt is fired
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class LatencyBudgetExceeded(requests.Timeout):
+    pass
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.logger = logging.getLogger("CIRCUIT_BREAKER")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == CircuitState.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(CircuitState.HALF_OPEN)
+            if self.state == CircuitState.CLOSED:
+                return
+            if self.state == CircuitState.HALF_OPEN and not self.probing:
+                # Let a single request through to probe the API
+                self.probing = True
+                return
+        raise CircuitOpenError("API circuit breaker is open")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != CircuitState.CLOSED:
+                self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                if self.state != CircuitState.OPEN:
+                    self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state: CircuitState):
+        self.logger.warning(f"API circuit breaker {self.state.value} -> {state.value}")
+        self.state = state
+
+
+def is_retryable(response: requests.Response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def backoff_delay(attempt: int, base: float = 0.1, cap: float = 2) -> float:
+    # Full jitter, so kiosks recovering from the same outage do not retry in lockstep
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ResilientCaller:
+    def __init__(self, breaker: CircuitBreaker, hedge_workers: int = 4):
+        self.logger = logging.getLogger("API_RESILIENCE")
+        self.breaker = breaker
+        self.executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="ApiHedge")
+
+    def call(self, send: Callable[[tuple[float, float]], requests.Response], policy: RequestPolicy,
+             idempotent: bool) -> requests.Response:
+        deadline = time.monotonic() + policy.budget
+        attempts = 1 + (policy.retries if idempotent else 0)
+        for attempt in range(attempts):
+            self.breaker.allow()
+            try:
+                # No hedging against an API that is already failing, the extra attempt would only add to its load
+                if idempotent and policy.hedge_after is not None and self.breaker.state == CircuitState.CLOSED:
+                    response = self._hedged(send, policy, deadline)
+                else:
+                    response = send(attempt_timeout(policy, deadline))
+            except requests.RequestException as err:
+                self.breaker.record_failure()
+                if attempt + 1 == attempts or not self._sleep_before_retry(attempt, deadline):
+                    raise
+                self.logger.debug("Retrying after error: %s", err)
+                continue
+
+            if not is_retryable(response):
+                self.breaker.record_success()
+                return response
+            self.breaker.record_failure()
+            if attempt + 1 == attempts or not self._sleep_before_retry(attempt, deadline):
+                return response
+            self.logger.debug("Retrying after HTTP %s", response.status_code)
+        raise LatencyBudgetExceeded("API latency budget exceeded")
+
+    def _sleep_before_retry(self, attempt: int, deadline: float) -> bool:
+        delay = backoff_delay(attempt)
+        if time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _hedged(self, send: Callable[[tuple[float, float]], requests.Response], policy: RequestPolicy,
+                deadline: float) -> requests.Response:
+        primary = self.executor.submit(send, attempt_timeout(policy, deadline))
+        futures: list[Future] = [primary]
+        done, _ = wait(futures, timeout=min(policy.hedge_after, max(deadline - time.monotonic(), 0)))
+        if not done and time.monotonic() < deadline:
+            self.logger.debug("Primary request is slow, sending a hedged request.")
+            futures.append(self.executor.submit(send, attempt_timeout(policy, deadline)))
+
+        # A retryable answer (e.g. a fast 503) only wins if the other attempt does no better
+        error: BaseException | None = None
+        retryable: requests.Response | None = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                elif is_retryable(future.result()):
+                    retryable = future.result()
+                else:
+                    return future.result()
+        if retryable is not None:
+            return retryable
+        if error is not None:
+            raise error
+        raise LatencyBudgetExceeded("API latency budget exceeded")
+
+
+def attempt_timeout(policy: RequestPolicy, deadline: float) -> tuple[float, float]:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise LatencyBudgetExceeded("API latency budget exceeded")
+    connect, read = policy.timeout
+    return min(connect, remaining), min(read, remaining)
@@ -1,6 +1,8 @@
-import requests
+from datetime import datetime, timezone
+from functools import cache
 
-from config import BASE_API_URL, API_KEY
+from api_clients.client import client
+from config import API_KEY
 
 
 def get_serial():
@@ -15,17 +17,25 @@ def get_serial():
         cpu_serial = "ERROR"
     return cpu_serial
 
-headers = {
-    "X-Device-Id": get_serial(),
-    "Authorization": f"Bearer {API_KEY}",
-}
+# Built on the first request rather than at import, to keep /proc reads off the boot path
+@cache
+def device_headers() -> dict[str, str]:
+    return {
+        "X-Device-Id": get_serial(),
+        "Authorization": f"Bearer {API_KEY}",
+    }
+
+def client_time_headers(client_time: float | None) -> dict[str, str]:
+    if client_time is None:
+        return device_headers()
+    return {**device_headers(), "X-Client-Time": datetime.fromtimestamp(client_time, timezone.utc).isoformat()}
 
 def fetch_active_entry(card_id: int):
-    return requests.get(BASE_API_URL + "reader/active-entry", json={"mifareNumber": card_id}, headers=headers)
+    return client.get("reader/active-entry", json={"mifareNumber": card_id}, headers=device_headers())
 
-def add_entry(ist_id: str, workstation_id: int):
-    return requests.post(BASE_API_URL + "reader/add-entry", json={"istId": ist_id, "workstationId": workstation_id},
-                         headers=headers)
+def add_entry(ist_id: str, workstation_id: int, client_time: float | None = None):
+    return client.post("reader/add-entry", json={"istId": ist_id, "workstationId": workstation_id},
+                       headers=client_time_headers(client_time))
 
-def close_entry(entry_id: int):
-    return requests.put(BASE_API_URL + "reader/close-entry/" + str(entry_id), headers=headers)
+def close_entry(entry_id: int, client_time: float | None = None):
+    return client.put("reader/close-entry", path="/" + str(entry_id), headers=client_time_headers(client_time))
@@ -1,39 +1,295 @@
+import json
 import logging
 import queue
+import random
 import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator
 
 import requests
 
-from config import BASE_API_URL
+from api_clients.client import client
+from diagnostics.metrics import WORKSTATION_POLL_SECONDS, WORKSTATION_REFRESHES
+from diagnostics.profiler import HEARTBEATS
 from obj.objects import Workstation, Message, MessageType
 
+STREAM_UNSUPPORTED = {404, 405, 501}
+
+
+@dataclass
+class SseEvent:
+    event: str = "message"
+    data: str = ""
+    id: str | None = None
+    retry: int | None = None # ms the server asks us to wait before reconnecting
+
+
+def read_events(lines: Iterable[str]) -> Iterator[SseEvent | None]:
+    # Yields an event per blank-line terminated block, and None for comments, which servers send as keep-alives
+    event = SseEvent()
+    data = []
+    for line in lines:
+        if not line:
+            if data:
+                event.data = "\n".join(data)
+                yield event
+            elif event.retry is not None:
+                yield event
+            event, data = SseEvent(), []
+            continue
+        if line.startswith(":"):
+            yield None
+            continue
+        name, _, value = line.partition(":")
+        value = value.removeprefix(" ")
+        if name == "event":
+            event.event = value
+        elif name == "data":
+            data.append(value)
+        elif name == "id":
+            event.id = value
+        elif name == "retry" and value.isdigit():
+            event.retry = int(value)
+
 
 class WorkstationPoller(threading.Thread):
-    def __init__(self, events: queue.Queue, stop_event: threading.Event, interval: int):
-        super().__init__()
+    # With a stream endpoint, occupancy changes are pushed by the API as they happen and polling only runs while the
+    # stream is down. A dropped stream is resumed from the last event id, and after stream_failures attempts in a row
+    # that got no events the poller goes back to polling for stream_retry seconds.
+    # A card scan asks for a refresh, so the room map it may lead to is at most fresh_for seconds old without
+    # shortening the interval every kiosk polls at.
+    def __init__(self, events: queue.Queue, stop_event: threading.Event, interval: float,
+                 fast_interval: float = 1, fast_window: float = 30, idle_interval: float = 30,
+                 idle_after: float = 10 * 60, night_hours: tuple[int, int] = (22, 7), max_backoff: float = 60,
+                 stale_after: float = 30, recover_after: int = 2, stream_endpoint: str | None = None,
+                 stream_retry: float = 60, stream_failures: int = 2, keepalive_timeout: float = 45,
+                 fresh_for: float = 1.5):
+        # Daemon, as a stream read may block until the keep-alive timeout
+        super().__init__(name="WorkstationPoller", daemon=True)
         self.logger = logging.getLogger("WORKSTATION_POLLER")
         self.events = events
         self.stop_event = stop_event
         self.interval = interval
+        self.fast_interval = fast_interval
+        self.fast_window = fast_window
+        self.idle_interval = idle_interval
+        self.idle_after = idle_after
+        self.night_hours = night_hours
+        self.max_backoff = max_backoff
+        self.stale_after = stale_after
+        self.recover_after = recover_after
+        self.stream_endpoint = stream_endpoint
+        self.stream_retry = stream_retry
+        self.stream_failures = stream_failures
+        self.keepalive_timeout = keepalive_timeout
+        self.fresh_for = fresh_for
+        # The longest the loop may legitimately wait, plus a request's budget
+        self.deadline = max(interval, idle_interval, max_backoff, keepalive_timeout) + 15
+
         self.data: list[Workstation] = []
-        self.raw_json = []
+        self.raw_content: bytes | None = None
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+
+        self.last_success: float | None = None
+        self.failures = 0
+        self.successes = 0
+        self.available: bool | None = None # None until the first poll
+        self.last_activity = time.monotonic()
+        self.fast_until = 0.0
+        self.wake_event = threading.Event()
+        self.refresh_pending = threading.Event()
+
+        self.last_event_id: str | None = None
+        self.reconnect_delay = 1.0
+        self.failed_streams = 0
+        self.stream_retry_at = 0.0
+        self.streaming = False
+
+    def nudge(self):
+        # Occupancy is about to change, poll fast for a while
+        now = time.monotonic()
+        self.last_activity = now
+        self.fast_until = now + self.fast_window
+        self.wake_event.set()
+
+    def refresh(self) -> bool:
+        # Returns whether an update message is on its way. Scans while a refresh is pending share it, and nothing is
+        # fetched when the data is fresh, pushed by the stream, or the API is failing and polls are backing off.
+        if self.streaming or self.failures or self.age() <= self.fresh_for:
+            WORKSTATION_REFRESHES.inc("skipped")
+            return False
+        if self.refresh_pending.is_set():
+            WORKSTATION_REFRESHES.inc("shared")
+            return True
+        WORKSTATION_REFRESHES.inc("fetched")
+        self.refresh_pending.set()
+        self.wake_event.set()
+        return True
+
+    def age(self) -> float:
+        # Seconds since the API last confirmed the data, a live stream is always current
+        if self.streaming:
+            return 0
+        if self.last_success is None:
+            return float("inf")
+        return time.monotonic() - self.last_success
 
     def run(self):
         while not self.stop_event.is_set():
-            try:
-                self.logger.debug("Fetching workstations from API...")
-                response = requests.get(BASE_API_URL + "workstations")
+            HEARTBEATS.beat(self.deadline)
+            if self.stream_endpoint and time.monotonic() >= self.stream_retry_at:
+                self.listen()
+                if self.failed_streams < self.stream_failures:
+                    self.stop_event.wait(self.reconnect_delay)
+                    continue
+                self.logger.warning(f"Workstation stream is down, polling for the next {self.stream_retry:.0f}s.")
+                self.failed_streams = 0
+                self.stream_retry_at = time.monotonic() + self.stream_retry
+
+            # Cleared before the poll, so a scan during it asks for one more instead of getting an older answer
+            refreshing = self.refresh_pending.is_set()
+            self.refresh_pending.clear()
+            start = time.perf_counter()
+            changed = self.poll()
+            WORKSTATION_POLL_SECONDS.observe(time.perf_counter() - start, "error" if self.failures else "ok")
+            # A requested refresh always answers, the kiosks waiting on it learn the data is confirmed
+            if changed or refreshing:
+                self.events.put(Message(MessageType.API_WORKSTATION_UPDATE, self.data if self.available else None))
+
+            self.wake_event.wait(self.next_interval())
+            self.wake_event.clear()
+        self.logger.info("Workstation poller stopped.")
+
+    def poll(self) -> bool:
+        was_available = self.available
+        try:
+            data_changed = self.fetch()
+        except Exception as err:
+            self.logger.error(f"Failed to fetch workstations from API with error: ${err}")
+            self.on_failure()
+            return was_available != self.available
+
+        self.on_success()
+        return (data_changed and self.available) or was_available != self.available
+
+    def on_failure(self):
+        self.failures += 1
+        self.successes = 0
+        # Keep serving the last known good data until it gets too old
+        if self.available is None:
+            self.available = False
+        elif self.available and time.monotonic() - self.last_success > self.stale_after:
+            self.logger.warning(f"Workstation data is older than {self.stale_after}s, pausing seat choice.")
+            self.available = False
+
+    def on_success(self):
+        self.failures = 0
+        self.successes += 1
+        self.last_success = time.monotonic()
+        # Only come back from an outage once the API has answered several polls in a row
+        if self.available is None or not self.available and self.successes >= self.recover_after:
+            self.available = True
+
+    def fetch(self) -> bool:
+        self.logger.debug("Fetching workstations from API...")
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+
+        response = client.get("workstations", headers=headers)
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        if response.content == self.raw_content:
+            return False
+
+        self.data = [Workstation.from_poller(ws) for ws in response.json()]
+        self.raw_content = response.content
+        self.logger.info(f"Updated {len(self.data)} workstations.")
+        return True
+
+    def listen(self):
+        headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache"}
+        if self.last_event_id is not None:
+            headers["Last-Event-ID"] = self.last_event_id
+        received = False
+        try:
+            with client.stream(self.stream_endpoint, self.keepalive_timeout, headers) as response:
+                if response.status_code in STREAM_UNSUPPORTED:
+                    self.logger.warning(f"The API has no workstation stream ({response.status_code}).")
+                    self.failed_streams = self.stream_failures
+                    return
                 response.raise_for_status()
-                json = response.json()
-                if self.raw_json != json:
-                    self.data = [Workstation.from_poller(ws) for ws in json]
-                    self.raw_json = json
-                    self.logger.info(f"Updated {len(self.data)} workstations.")
-            except Exception as err:
-                self.logger.error(f"Failed to fetch workstations from API with error: ${err}")
-                self.data = None
-                self.raw_json = None
-
-            self.events.put(Message(MessageType.API_WORKSTATION_UPDATE, self.data))
-            self.stop_event.wait(self.interval)
-        self.logger.info("Workstation poller stopped.")
\ No newline at end of file
+                response.encoding = "utf-8"
+                self.logger.info(f"Workstation stream connected, resuming from event {self.last_event_id}.")
+                self.streaming = True
+                was_available = self.available
+                self.on_success()
+                for event in read_events(response.iter_lines(chunk_size=None, decode_unicode=True)):
+                    if self.stop_event.is_set():
+                        return
+                    # Keep-alives count too, a stream that stayed up for a while is worth resuming
+                    HEARTBEATS.beat(self.deadline)
+                    received = True
+                    self.failed_streams = 0
+                    self.on_success()
+                    changed = event is not None and self.apply(event)
+                    if changed or was_available != self.available:
+                        self.events.put(Message(MessageType.API_WORKSTATION_UPDATE, self.data if self.available else None))
+                    was_available = self.available
+            self.logger.info("Workstation stream closed by the API.")
+        except (requests.RequestException, ValueError, KeyError) as err:
+            self.logger.error(f"Workstation stream failed with error: {err}")
+        finally:
+            self.streaming = False
+        if not received:
+            self.failed_streams += 1
+            was_available = self.available
+            self.on_failure()
+            if was_available != self.available:
+                self.events.put(Message(MessageType.API_WORKSTATION_UPDATE, None))
+
+    def apply(self, event: SseEvent) -> bool:
+        if event.retry is not None:
+            self.reconnect_delay = event.retry / 1000
+        if event.id is not None:
+            self.last_event_id = event.id
+        if not event.data:
+            return False
+        if event.event == "snapshot":
+            self.data = [Workstation.from_poller(ws) for ws in json.loads(event.data)]
+        elif event.event == "workstation":
+            changed = Workstation.from_poller(json.loads(event.data))
+            if any(ws.id == changed.id for ws in self.data):
+                self.data = [changed if ws.id == changed.id else ws for ws in self.data]
+            else:
+                self.data = self.data + [changed]
+        else:
+            return False
+        # Polling must not skip its next answer as unchanged, the stream has moved past it
+        self.etag = self.last_modified = self.raw_content = None
+        self.logger.debug("Applied %s event %s.", event.event, event.id)
+        return True
+
+    def next_interval(self) -> float:
+        if self.failures:
+            backoff = min(self.interval * 2 ** (self.failures - 1), self.max_backoff)
+            return backoff * random.uniform(0.5, 1)
+        now = time.monotonic()
+        if now < self.fast_until:
+            return self.fast_interval
+        if now - self.last_activity > self.idle_after and self.is_night():
+            return self.idle_interval
+        return self.interval
+
+    def is_night(self) -> bool:
+        start, end = self.night_hours
+        hour = datetime.now().hour
+        return hour >= start or hour < end if start > end else start <= hour < end
@@ -0,0 +1,20 @@
+import sys
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+class Checks:
+    # Prints each check as it runs and exits non-zero at the end if any of them failed
+    def __init__(self):
+        self.failures: list[str] = []
+
+    def __call__(self, name: str, ok: bool):
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            self.failures.append(name)
+
+    def exit(self):
+        sys.exit(1 if self.failures else 0)
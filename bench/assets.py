@@ -0,0 +1,63 @@
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+import tkinter as tk
+
+from gui.assets import AssetCache
+
+ASSETS = [
+    ("gui/images/dem.png", 0.13),
+    ("gui/images/qrcode.png", 0.1),
+    ("gui/images/arrow.png", 0.05),
+]
+
+
+def load_all(cache: AssetCache, width: int, height: int, with_tk: bool) -> float:
+    start = time.perf_counter()
+    for path, ratio in ASSETS:
+        if with_tk:
+            cache.load(path, ratio, width, height)
+        else:
+            cache.resized(path, ratio, width, height)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold and warm GUI asset loading")
+    parser.add_argument("--screen", default="1920x1080", help="screen size as WIDTHxHEIGHT")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    width, height = (int(n) for n in args.screen.split("x"))
+
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        with_tk = True
+    except tk.TclError:
+        print("No display available, timing the on-disk stage only (no Tk image decoding)")
+        root = None
+        with_tk = False
+
+    cold, warm = [], []
+    cache_dir = tempfile.mkdtemp(prefix="lemac-assets-")
+    try:
+        for _ in range(args.rounds):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cache = AssetCache(cache_dir)
+            cold.append(load_all(cache, width, height, with_tk))
+            warm.append(load_all(cache, width, height, with_tk))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if root is not None:
+            root.destroy()
+
+    print(f"Assets at {width}x{height}, {args.rounds} rounds:")
+    print(f"  cold: median={statistics.median(cold):.1f}ms max={max(cold):.1f}ms")
+    print(f"  warm: median={statistics.median(warm):.1f}ms max={max(warm):.1f}ms")
+    print(f"  speedup: {statistics.median(cold) / statistics.median(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import logging
+import os
+import queue
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from bench._util import percentile
+from bench.stub_api import StubApi
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def build_trace(students: int, duration: float, seed: int) -> list[tuple[float, int]]:
+    # A class change: arrivals bunch up at the start of the window instead of being spread evenly
+    rng = random.Random(seed)
+    times = sorted(duration * rng.betavariate(1.2, 3) for _ in range(students))
+    cards = rng.sample(range(100000, 999999), students)
+    return list(zip(times, cards))
+
+
+class HeadlessKiosk:
+    # Follows App's dispatch for a card scan without Tk: lookup, then pick a seat or check out
+    # dwell and seat_delay are in trace seconds and get compressed by speed, API latency does not
+    def __init__(self, events: queue.Queue, api_events, dwell: float, seat_delay: float, speed: float,
+                 rng: random.Random):
+        from api_clients.jobs import ApiJob, ApiJobType
+        from obj.objects import MessageType
+
+        self.ApiJob, self.ApiJobType, self.MessageType = ApiJob, ApiJobType, MessageType
+        self.events = events
+        self.api_events = api_events
+        self.dwell = dwell
+        self.seat_delay = seat_delay
+        self.speed = speed
+        self.rng = rng
+        self.workstations = []
+        self.latencies: list[float] = []
+        self.outcomes: dict[str, int] = {}
+        self.updates = 0
+
+    def scan(self, card_id: int, timeout: float = 30) -> tuple[str, float]:
+        # Returns the outcome and how long the kiosk was busy with the student up to the result, in trace seconds
+        MessageType = self.MessageType
+        scanned_at = time.monotonic()
+        busy = timeout
+        self.api_events.put(self.ApiJob(self.ApiJobType.FETCH_ACTIVE_ENTRY, card_id, deadline=scanned_at + 10))
+        while True:
+            msg = self.next_message(scanned_at + timeout)
+            if msg is None:
+                outcome = "TIMEOUT"
+                break
+            if msg.type == MessageType.API_CACHE_CORRECTION or msg.card_id != card_id:
+                continue
+            busy = time.monotonic() - scanned_at
+            self.latencies.append(busy)
+            outcome = msg.type.name
+            if msg.type == MessageType.API_NO_ACTIVE_ENTRY:
+                outcome = self.choose_seat(msg.payload)
+                busy += self.seat_delay
+            elif msg.type == MessageType.API_ACTIVE_ENTRY_FOUND:
+                self.api_events.put(self.ApiJob(self.ApiJobType.CLOSE_ENTRY, {"entry_id": msg.payload, "card_id": card_id}))
+            break
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.drain(time.monotonic() + self.dwell / self.speed)
+        return outcome, busy
+
+    def choose_seat(self, student_id: str) -> str:
+        self.drain(time.monotonic() + self.seat_delay / self.speed)
+        free = [ws for ws in self.workstations if not ws.occupied]
+        if not free:
+            return "ROOM_FULL"
+        ws = self.rng.choice(free)
+        self.api_events.put(self.ApiJob(self.ApiJobType.ADD_ENTRY,
+                                        {"ws_id": ws.id, "ws_name": ws.name, "student_id": student_id}))
+        ws.occupied = True
+        return "SEAT_RESERVED"
+
+    def next_message(self, until: float):
+        while True:
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                msg = self.events.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if msg.type == self.MessageType.API_WORKSTATION_UPDATE:
+                self.on_workstation_update(msg)
+                continue
+            return msg
+
+    def drain(self, until: float):
+        while self.next_message(until) is not None:
+            pass
+
+    def on_workstation_update(self, msg):
+        self.updates += 1
+        if msg.payload is not None:
+            self.workstations = msg.payload
+
+
+def simulate(arrivals: list[float], services: list[float], dwell: float, preempt: bool) -> tuple[list[float], float]:
+    # The queue at the door on a trace-time clock. Without preemption every result stays up for the full dwell,
+    # with it the next card is read as soon as the result is on screen.
+    waits = []
+    free_at = 0.0
+    for arrival, service in zip(arrivals, services):
+        served_at = max(arrival, free_at)
+        waits.append(served_at - arrival)
+        free_at = served_at + service + (0 if preempt else dwell)
+    return waits, free_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the API workers and poller with a synthetic scan trace")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=300, help="seconds over which students arrive")
+    parser.add_argument("--speed", type=float, default=10, help="compress the trace and dwell times by this factor")
+    parser.add_argument("--leaving", type=float, default=0.5, help="fraction of students checking out")
+    parser.add_argument("--unknown", type=float, default=0.02, help="fraction of unregistered cards")
+    parser.add_argument("--dwell", type=float, default=3, help="seconds an answer stays on screen")
+    parser.add_argument("--preempt", action=argparse.BooleanOptionalAction, default=True,
+                        help="the next card is read while a result is still on screen")
+    parser.add_argument("--seat-delay", type=float, default=2, help="seconds a student takes to pick a seat")
+    parser.add_argument("--fresh-for", type=float, default=1.5, help="seconds before a scan refreshes the workstations")
+    parser.add_argument("--workstations", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-fraction", type=float, default=0.02)
+    parser.add_argument("--slow-latency", type=float, default=2)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the largest Python heap growth")
+    parser.add_argument("--max-p95", type=float, help="exit with 1 if p95 scan-to-result exceeds this many ms")
+    parser.add_argument("--verbose", action="store_true", help="show the app's logs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    stub = StubApi(latency=args.latency, slow_fraction=args.slow_fraction, slow_latency=args.slow_latency,
+                   error_rate=args.error_rate, workstations=args.workstations).start()
+    workdir = tempfile.mkdtemp(prefix="lemac-load-")
+    os.environ["BASE_API_URL"] = stub.url
+    os.environ["JOURNAL_FILE"] = os.path.join(workdir, "journal.db")
+
+    from api_clients.ApiWorker import ApiWorkerPool
+    from api_clients.jobs import ApiJobQueue
+    from api_clients.journal import EntryJournal, JournalReplayer
+    from api_clients.workstations import WorkstationPoller
+    from diagnostics.metrics import WORKSTATION_REFRESHES
+    from obj.event_queue import WakeupQueue
+
+    rng = random.Random(args.seed)
+    trace = build_trace(args.students, args.duration, args.seed)
+    leaving = [card for _, card in trace if rng.random() < args.leaving]
+    for workstation_id, card in enumerate(leaving[:len(stub.state.workstations)], start=1):
+        stub.state.add_entry(stub.state.student_for(card), workstation_id)
+    stub.state.unknown_cards.update(card for _, card in trace if rng.random() < args.unknown)
+
+    events = WakeupQueue()
+    api_events = ApiJobQueue()
+    stop_event = threading.Event()
+    journal = EntryJournal(os.environ["JOURNAL_FILE"])
+    replayer = JournalReplayer(stop_event, journal)
+    pool = ApiWorkerPool(events, api_events, stop_event, journal, replayer, args.workers)
+    poller = WorkstationPoller(events, stop_event, 5, fresh_for=args.fresh_for)
+    kiosk = HeadlessKiosk(events, api_events, args.dwell, args.seat_delay, args.speed, rng)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    replayer.start()
+    pool.start()
+    poller.start()
+    kiosk.drain(time.monotonic() + 1)
+
+    rss_start = rss_kb()
+    heap_start = tracemalloc.take_snapshot() if args.tracemalloc else None
+    # The queue at the door is simulated on a trace-time clock, as uncompressed API latency would skew wall time
+    service_times = []
+    start = time.monotonic()
+    for arrival, card in trace:
+        kiosk.drain(start + arrival / args.speed)
+        poller.refresh()
+        outcome, busy = kiosk.scan(card)
+        service_times.append(busy)
+        if outcome in ("SEAT_RESERVED", "API_ACTIVE_ENTRY_FOUND"):
+            poller.nudge()
+    elapsed = time.monotonic() - start
+
+    # Let the journal replay the last writes before measuring what stayed behind
+    deadline = time.monotonic() + 10
+    while journal.has_pending() and time.monotonic() < deadline:
+        kiosk.drain(time.monotonic() + 0.1)
+    rss_end = rss_kb()
+    pending = journal.pending_count()
+    heap_end = tracemalloc.take_snapshot() if args.tracemalloc else None
+
+    stop_event.set()
+    pool.join()
+    stub.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    arrivals = [arrival for arrival, _ in trace]
+    policies = {preempt: simulate(arrivals, service_times, args.dwell, preempt) for preempt in (False, True)}
+    door_waits, kiosk_free_at = policies[args.preempt]
+
+    latencies_ms = [latency * 1000 for latency in kiosk.latencies]
+    print(f"Trace: {args.students} students over {args.duration:.0f}s at {args.speed:g}x, {args.workers} workers, "
+          f"stub latency {args.latency * 1000:.0f}ms ({args.slow_fraction:.0%} at {args.slow_latency:g}s), "
+          f"errors {args.error_rate:.0%}")
+    print(f"Throughput: {len(trace) / kiosk_free_at * 60:.1f} students/min over the trace, kiosk capacity "
+          f"{60 / (statistics.mean(service_times) + (0 if args.preempt else args.dwell)):.1f} students/min, "
+          f"{len(trace) / elapsed:.1f} scans/s wall clock")
+    for preempt, (waits, free_at) in policies.items():
+        print(f"  {'next card preempts the result' if preempt else 'full result dwell':30} "
+              f"{len(trace) / free_at * 60:.1f} students/min, door wait p95={percentile(waits, 0.95):.1f}s")
+    if latencies_ms:
+        print(f"Scan to result: p50={percentile(latencies_ms, 0.5):.0f}ms p95={percentile(latencies_ms, 0.95):.0f}ms "
+              f"p99={percentile(latencies_ms, 0.99):.0f}ms max={max(latencies_ms):.0f}ms")
+    print(f"Wait at the door: p50={percentile(door_waits, 0.5):.1f}s p95={percentile(door_waits, 0.95):.1f}s "
+          f"max={max(door_waits):.1f}s")
+    print("Outcomes: " + ", ".join(f"{name}={count}" for name, count in sorted(kiosk.outcomes.items())))
+    print(f"Workstation updates: {kiosk.updates}, stub requests: {stub.requests}, "
+          f"journal pending: {pending}")
+    print("Refreshes on scan: " + ", ".join(f"{result}={count:.0f}"
+                                            for (result,), count in sorted(WORKSTATION_REFRESHES.values.items())))
+    print(f"Memory: RSS {rss_start / 1024:.1f}MB -> {rss_end / 1024:.1f}MB ({(rss_end - rss_start) / 1024:+.1f}MB)")
+    if heap_start is not None:
+        for stat in heap_end.compare_to(heap_start, "lineno")[:5]:
+            print(f"  {stat}")
+
+    if args.max_p95 is not None and latencies_ms and percentile(latencies_ms, 0.95) > args.max_p95:
+        print(f"p95 scan to result is over {args.max_p95:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
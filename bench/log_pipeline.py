@@ -0,0 +1,123 @@
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from diagnostics.logs import DATE_FORMAT, TEXT_FORMAT, dropped_records, setup_logging
+
+RESPONSE = {"code": "NO_ACTIVE_ENTRY", "student": {"istId": "ist1123456", "name": "Test Student", "courses": list(range(20))}}
+
+
+class SlowFile:
+    # Stands in for an SD card that now and then takes a while to accept a write
+    def __init__(self, f, stall: float, every: int):
+        self.f = f
+        self.stall = stall
+        self.every = every
+        self.flushes = 0
+
+    def __getattr__(self, name: str):
+        return getattr(self.f, name)
+
+    def write(self, data: str):
+        return self.f.write(data)
+
+    def flush(self):
+        self.flushes += 1
+        if self.every and self.flushes % self.every == 0:
+            time.sleep(self.stall)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+def direct(path: str, level: int, stall: float, every: int) -> list[logging.Handler]:
+    # What App used to install: handlers called synchronously by every logging thread
+    file_handler = RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=7, encoding="utf-8")
+    file_handler.stream = SlowFile(file_handler.stream, stall, every)
+    handlers = [logging.StreamHandler(), file_handler]
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(level)
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+        root.addHandler(handler)
+    return handlers
+
+
+def run_threads(threads: int, records: int, interval: float) -> list[float]:
+    # Several threads log like the GUI, API workers and card scanner do, timing each call
+    samples: list[list[float]] = [[] for _ in range(threads)]
+
+    def work(i: int):
+        logger = logging.getLogger(f"BENCH_{i}")
+        for n in range(records):
+            start = time.perf_counter()
+            logger.info("Scanned card ID: %s", 100000 + n)
+            logger.debug("API Response: %s", RESPONSE)
+            samples[i].append((time.perf_counter() - start) * 1e6)
+            time.sleep(interval)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [sample for thread_samples in samples for sample in thread_samples]
+
+
+def summary(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    return (f"median={statistics.median(ordered):.1f}us p99={ordered[int(len(ordered) * 0.99)]:.1f}us "
+            f"max={ordered[-1]:.0f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the cost of a log call with direct and queued handlers")
+    parser.add_argument("--records", type=int, default=5000, help="log call pairs per thread")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.001, help="seconds between call pairs in each thread")
+    parser.add_argument("--stall", type=float, default=0.05, help="seconds an SD card flush stalls")
+    parser.add_argument("--stall-every", type=int, default=500, help="flushes between stalls, 0 for none")
+    parser.add_argument("--debug", action="store_true", help="log at DEBUG like --debug on the kiosk")
+    parser.add_argument("--json", action="store_true", help="use the JSON-lines formatter in the queued pipeline")
+    args = parser.parse_args()
+    level = logging.DEBUG if args.debug else logging.INFO
+    workdir = tempfile.mkdtemp(prefix="lemac-logs-")
+
+    # The console goes nowhere so the terminal does not dominate either run
+    sys.stderr = open(os.devnull, "w")
+    handlers = direct(os.path.join(workdir, "direct.log"), level, args.stall, args.stall_every)
+    start = time.perf_counter()
+    before = run_threads(args.threads, args.records, args.interval)
+    before_s = time.perf_counter() - start
+    for handler in handlers:
+        handler.close()
+
+    writer = setup_logging(level, os.path.join(workdir, "queued.log"), "json" if args.json else "text")
+    for file_handler in writer.handlers[1:]:
+        file_handler.stream = SlowFile(file_handler.stream, args.stall, args.stall_every)
+    start = time.perf_counter()
+    after = run_threads(args.threads, args.records, args.interval)
+    after_s = time.perf_counter() - start
+    writer.stop()
+    sys.stderr = sys.__stderr__
+
+    calls = args.threads * args.records
+    print(f"{calls} log call pairs from {args.threads} threads every {args.interval * 1000:g}ms "
+          f"at {logging.getLevelName(level)}, "
+          f"flush stalls of {args.stall * 1000:.0f}ms every {args.stall_every} flushes")
+    print(f"  direct: {summary(before)}, {before_s:.2f}s total")
+    print(f"  queued: {summary(after)}, {after_s:.2f}s total, {dropped_records()} dropped")
+    for name in ("direct.log", "queued.log"):
+        print(f"  {name}: {sum(1 for _ in open(os.path.join(workdir, name), encoding='utf-8'))} lines")
+
+
+if __name__ == "__main__":
+    main()
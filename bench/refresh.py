@@ -0,0 +1,69 @@
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+
+from bench._util import Checks, percentile
+from bench.stream import occupied, wait_for_update
+from bench.stub_api import StubApi
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise the workstation refresh a card scan asks for")
+    parser.add_argument("--rounds", type=int, default=5, help="pairs of scans from two readers")
+    parser.add_argument("--fresh-for", type=float, default=1.5, help="seconds the data counts as fresh")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub latency, so the refresh is in flight a while")
+    parser.add_argument("--wait", type=float, default=0.5, help="seconds the room map waits for a refresh")
+    parser.add_argument("--verbose", action="store_true", help="show the poller's logs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    stub = StubApi(latency=args.latency, workstations=args.rounds + 10).start()
+    os.environ["BASE_API_URL"] = stub.url
+    from api_clients.workstations import WorkstationPoller
+    from diagnostics.metrics import WORKSTATION_REFRESHES
+
+    check = Checks()
+
+    def refreshes(result: str) -> int:
+        return int(WORKSTATION_REFRESHES.values.get((result,), 0))
+
+    events = queue.Queue()
+    stop_event = threading.Event()
+    # A long interval, so every fetch below comes from a scan and not from the regular poll
+    poller = WorkstationPoller(events, stop_event, 60, fresh_for=args.fresh_for)
+    poller.start()
+    wait_for_update(events, lambda workstations: workstations is not None, 5)
+
+    print("Scan right after a poll")
+    check("nothing is fetched", not poller.refresh() and refreshes("skipped") == 1)
+
+    print(f"Two readers scan {args.fresh_for:g}s+ after the last poll, a seat taken just before")
+    answers = []
+    requests_before = stub.requests
+    for workstation_id in range(1, args.rounds + 1):
+        time.sleep(args.fresh_for + 0.1)
+        stub.state.add_entry(f"ist1{workstation_id:06d}", workstation_id)
+        start = time.monotonic()
+        first, second = poller.refresh(), poller.refresh()
+        delay = wait_for_update(events, occupied(workstation_id), args.wait * 4)
+        answers.append((time.monotonic() - start) * 1000 if first and second and delay is not None else float("inf"))
+    print(f"  refreshes fetched={refreshes('fetched')} shared={refreshes('shared')}, "
+          f"stub requests {stub.requests - requests_before}")
+    print(f"  scan to fresh data p50={percentile(answers, 0.5):.0f}ms max={max(answers):.0f}ms")
+    check("the first scan of each pair fetches", refreshes("fetched") == args.rounds)
+    check("the second scan shares that fetch", refreshes("shared") == args.rounds)
+    check("one request per pair", stub.requests - requests_before == args.rounds)
+    check("every taken seat shows up", all(answer != float("inf") for answer in answers))
+    check(f"fresh data before the room map stops waiting ({args.wait * 1000:.0f}ms)", max(answers) < args.wait * 1000)
+
+    stop_event.set()
+    poller.wake_event.set()
+    stub.stop()
+    check.exit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import os
+import statistics
+import time
+
+from bench._util import Checks, percentile
+from bench.stub_api import StubApi
+
+
+def timed(call) -> tuple[float, str]:
+    start = time.perf_counter()
+    try:
+        response = call()
+        outcome = str(response.status_code)
+    except Exception as err:
+        outcome = type(err).__name__
+    return (time.perf_counter() - start) * 1000, outcome
+
+
+def main():
+    stub = StubApi().start()
+    os.environ["BASE_API_URL"] = stub.url
+    from api_clients.client import ENDPOINT_POLICIES
+    from api_clients.resilience import CircuitState
+    from api_clients.students import fetch_active_entry
+    from api_clients.client import client
+
+    budget_ms = ENDPOINT_POLICIES["reader/active-entry"].budget * 1000
+    check = Checks()
+
+    # One hedge answers a lookup whose first attempt is slow. About 4% are slow on both attempts and fall back to
+    # a retry, so the check is on p90 and the slowest lookup is only held to the budget.
+    print("Tail latency: 20% of responses delayed by 3 s")
+    stub.slow_fraction, stub.slow_latency = 0.2, 3
+    samples = [timed(lambda: fetch_active_entry(i))[0] for i in range(100)]
+    print(f"  p50={percentile(samples, 0.5):.0f}ms p90={percentile(samples, 0.9):.0f}ms "
+          f"p95={percentile(samples, 0.95):.0f}ms max={max(samples):.0f}ms mean={statistics.mean(samples):.0f}ms")
+    check("hedged requests keep p90 under 1.5 s", percentile(samples, 0.9) < 1500)
+    check("slow lookups stay within their latency budget", max(samples) < budget_ms + 500)
+
+    print("Stalled server: every response delayed by 30 s")
+    stub.slow_fraction, stub.latency = 0, 30
+    elapsed, outcome = timed(lambda: fetch_active_entry(1))
+    print(f"  {elapsed:.0f}ms -> {outcome}")
+    check("lookup gives up within its latency budget", elapsed < budget_ms + 500)
+
+    print("Server down: every response is a 503")
+    stub.latency, stub.down = 0.01, True
+    samples = [timed(lambda: fetch_active_entry(1)) for _ in range(10)]
+    for elapsed, outcome in samples:
+        print(f"  {elapsed:.1f}ms -> {outcome}")
+    check("circuit breaker opens", client.breaker.state == CircuitState.OPEN)
+    check("open circuit fails fast", samples[-1][1] == "CircuitOpenError" and samples[-1][0] < 5)
+
+    print("Server back: breaker half-opens after its reset timeout")
+    stub.down = False
+    client.breaker.opened_at -= client.breaker.reset_timeout
+    elapsed, outcome = timed(lambda: fetch_active_entry(1))
+    print(f"  {elapsed:.0f}ms -> {outcome}")
+    check("circuit breaker closes again", client.breaker.state == CircuitState.CLOSED)
+
+    stub.stop()
+    check.exit()
+
+
+if __name__ == "__main__":
+    main()
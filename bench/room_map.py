@@ -0,0 +1,96 @@
+import argparse
+import logging
+import queue
+import random
+import statistics
+import time
+import tkinter as tk
+
+from gui.layout import FreeSeatIndex, compile_layout, parse_layout
+from obj.objects import Workstation, WorkstationType
+
+
+def synthetic_layout(zones: int, rows: int, clusters: int) -> dict:
+    # Zones of paired seats with a door in the bottom-right corner, numbered across the whole layout
+    names = iter(range(1, zones * rows * clusters * 2 + 1))
+    return {"zones": [{
+        "name": f"Zone {z + 1}",
+        "rows": [[["D", "D"] if r == rows - 1 and c == clusters - 1 else [str(next(names)), str(next(names))]
+                  for c in range(clusters)] for r in range(rows)],
+    } for z in range(zones)]}
+
+
+def timed_ms(call, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time seat suggestion, hit-testing and drawing as the room grows")
+    parser.add_argument("--screen", default="1920x1080", help="screen size as WIDTHxHEIGHT")
+    parser.add_argument("--zones", default="1,4,16,64", help="comma separated zone counts to try")
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--clusters", type=int, default=6)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    width, height = (int(n) for n in args.screen.split("x"))
+    rng = random.Random(1)
+
+    try:
+        root = tk.Tk()
+        root.geometry(f"{width}x{height}")
+        canvas = tk.Canvas(root, width=width, height=height)
+        canvas.pack()
+        root.update()
+    except tk.TclError:
+        print("No display available, skipping the canvas drawing times")
+        root = canvas = None
+
+    print(f"{'seats':>7} {'update':>9} {'nearest':>9} {'hit':>9} {'draw':>9} {'items':>7}")
+    for zones in (int(n) for n in args.zones.split(",")):
+        layout = parse_layout(synthetic_layout(zones, args.rows, args.clusters))
+        workstations = [Workstation(i, name, rng.choice(list(WorkstationType)), rng.random() < 0.7)
+                        for i, name in enumerate(layout.names)]
+        index = FreeSeatIndex(layout)
+        index.update(workstations)
+
+        def churn():
+            # What a poll does in a busy minute: a few seats change, the rest of the list is the same
+            changed = list(workstations)
+            for i in rng.sample(range(len(changed)), 3):
+                ws = changed[i]
+                changed[i] = Workstation(ws.id, ws.name, ws.type, not ws.occupied)
+            index.update(changed)
+
+        geometry = compile_layout(layout.zones[0], width, height)
+        points = [(rng.uniform(0, width), rng.uniform(0, height)) for _ in range(1000)]
+        update_ms = timed_ms(churn, args.rounds)
+        nearest_ms = timed_ms(lambda: [index.nearest(kind) for kind in WorkstationType], args.rounds)
+        hit_ms = timed_ms(lambda: [geometry.hit(x, y) for x, y in points], 20) / len(points)
+
+        draw_ms, items = float("nan"), 0
+        if canvas is not None:
+            from gui.room_map import RoomMap
+            room_map = RoomMap(logging.getLogger("BENCH"), queue.Queue(), canvas, layout)
+
+            def draw():
+                room_map.size = None
+                room_map.draw(workstations, "ist1000000")
+                root.update_idletasks()
+
+            draw_ms = timed_ms(draw, 10)
+            items = len(canvas.find_all())
+            room_map.hide()
+        print(f"{len(workstations):>7} {update_ms:>7.3f}ms {nearest_ms * 1000:>7.2f}us {hit_ms * 1000:>7.2f}us "
+              f"{draw_ms:>7.1f}ms {items:>7}")
+
+    if root is not None:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+from bench.load import rss_kb
+from bench.stub_api import StubApi
+
+
+def tcl_counts(root: tk.Tk, canvases: list[tk.Canvas]) -> dict[str, int]:
+    return {
+        "rss_kb": rss_kb(),
+        "tcl_commands": len(root.tk.splitlist(root.tk.call("info", "commands"))),
+        "after_pending": len(root.tk.splitlist(root.tk.call("after", "info"))),
+        "canvas_items": sum(len(canvas.find_all()) for canvas in canvases),
+    }
+
+
+class SoakDriver:
+    # Plays students at the kiosk through the real App: scan, tap the suggested seat on the map, wait for the reset.
+    # Every card alternates between checking in and checking out, so the room never fills up.
+    def __init__(self, app, cycles: int, sample_every: int, cards: int, cycle_timeout: float):
+        from obj.objects import Message, MessageType
+
+        self.Message, self.MessageType = Message, MessageType
+        self.app = app
+        self.session = next(iter(app.sessions.values()))
+        self.backend = app.card_readers[0].backend
+        self.cycles = cycles
+        self.sample_every = sample_every
+        self.cards = [200000 + i for i in range(cards)]
+        self.cycle_timeout = cycle_timeout
+        self.done = 0
+        self.stuck = 0
+        self.card: int | None = None
+        self.seen_card = False
+        self.clicked = False
+        self.started_at = 0.0
+        self.samples: list[tuple[int, dict[str, int]]] = []
+
+    def step(self):
+        session = self.session
+        if self.card is None:
+            if session.ready_event.is_set() and session.current_card is None:
+                self.card = self.cards[self.done % len(self.cards)]
+                self.seen_card = self.clicked = False
+                self.started_at = time.monotonic()
+                self.backend.feed(self.card)
+        elif session.current_card == self.card:
+            self.seen_card = True
+            room_map = session.gui.room_map
+            if room_map.visible and not self.clicked:
+                self.clicked = self.tap_suggested_seat(room_map)
+        elif self.seen_card and session.current_card is None:
+            self.finish_cycle()
+        if self.card is not None and time.monotonic() - self.started_at > self.cycle_timeout:
+            self.stuck += 1
+            self.app.events.put(self.Message(self.MessageType.CANCEL_SEAT_SELECTION, reader_id=session.reader.id))
+            self.finish_cycle()
+
+        if self.done >= self.cycles:
+            self.app.root.quit()
+        else:
+            self.app.root.after(2, self.step)
+
+    def tap_suggested_seat(self, room_map) -> bool:
+        names = [room_map.free_seats.nearest(kind) for kind in room_map.free_seats.free]
+        names = [name for name in names if name is not None and name in room_map.geometry.boxes]
+        if not names:
+            return False
+        x1, y1, x2, y2 = room_map.geometry.boxes[names[0]]
+        # Goes through the canvas' own picking and the seat binding, like a finger would
+        room_map.canvas.event_generate("<Button-1>", x=int((x1 + x2) / 2), y=int((y1 + y2) / 2))
+        return True
+
+    def finish_cycle(self):
+        self.card = None
+        self.done += 1
+        if self.done % self.sample_every == 0:
+            self.samples.append((self.done, tcl_counts(self.app.root, [s.gui.canvas for s in self.app.sessions.values()])))
+            counts = self.samples[-1][1]
+            print(f"  {self.done:>6} cycles: " + " ".join(f"{name}={value}" for name, value in counts.items()), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scan/select cycles through the real GUI and check that memory "
+                                                 "and Tcl objects stay flat (needs a display, e.g. xvfb-run)")
+    parser.add_argument("--cycles", type=int, default=3000)
+    parser.add_argument("--sample-every", type=int, default=250)
+    parser.add_argument("--cards", type=int, default=10, help="distinct students taking turns")
+    parser.add_argument("--dwell", type=int, default=10, help="ms an answer stays on screen")
+    parser.add_argument("--cycle-timeout", type=float, default=10)
+    parser.add_argument("--max-rss-growth", type=int, default=4096, help="KB allowed after the first sample")
+    parser.add_argument("--max-command-growth", type=int, default=10, help="Tcl commands allowed after the first sample")
+    parser.add_argument("--verbose", action="store_true", help="show the app's logs")
+    args = parser.parse_args()
+
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        print("The soak test drives the real Tk GUI and needs a display, run it under xvfb-run.")
+        sys.exit(2)
+
+    stub = StubApi(latency=0.001, workstations=38).start()
+    workdir = tempfile.mkdtemp(prefix="lemac-soak-")
+    os.environ.update({
+        "BASE_API_URL": stub.url,
+        "JOURNAL_FILE": os.path.join(workdir, "journal.db"),
+        "LOG_FILE": os.path.join(workdir, "reader.log"),
+        "ASSET_CACHE_DIR": os.path.join(workdir, "assets"),
+        "CARD_READER": "simulated",
+        "READERS": "",
+        "METRICS_PORT": "0",
+        "RESULT_DWELL_MS": str(args.dwell),
+        "ERROR_DWELL_MS": str(args.dwell),
+    })
+    import main as kiosk
+
+    app = kiosk.App()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    driver = SoakDriver(app, args.cycles, args.sample_every, args.cards, args.cycle_timeout)
+    app.root.after(500, driver.step)
+    print(f"Soaking {args.cycles} scan/select cycles with {args.cards} students")
+    start = time.monotonic()
+    app.start()
+    elapsed = time.monotonic() - start
+    stub.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{driver.done} cycles in {elapsed:.0f}s, {driver.stuck} stuck and cancelled")
+    if len(driver.samples) < 2:
+        print("Not enough samples to compare, raise --cycles or lower --sample-every")
+        sys.exit(2)
+    (_, first), (_, last) = driver.samples[0], driver.samples[-1]
+    failures = []
+    if last["rss_kb"] - first["rss_kb"] > args.max_rss_growth:
+        failures.append(f"RSS grew by {last['rss_kb'] - first['rss_kb']}KB")
+    if last["tcl_commands"] - first["tcl_commands"] > args.max_command_growth:
+        failures.append(f"Tcl commands grew by {last['tcl_commands'] - first['tcl_commands']}")
+    if last["canvas_items"] > first["canvas_items"]:
+        failures.append(f"canvas items grew from {first['canvas_items']} to {last['canvas_items']}")
+    if last["after_pending"] > first["after_pending"] + 2:
+        failures.append(f"pending after callbacks grew from {first['after_pending']} to {last['after_pending']}")
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    if not failures:
+        print("  ok   RSS, Tcl commands, canvas items and pending callbacks stayed flat")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
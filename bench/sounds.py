@@ -0,0 +1,59 @@
+import threading
+import time
+
+from bench._util import Checks
+from pi.sounds import BEEP, PLING, WRONG, RecordingBackend, SoundPlayer, Sound, Tone
+
+
+def play(sound: Sound, then: Sound | None = None, after: float = 0) -> list[tuple[float, str, float | None]]:
+    backend = RecordingBackend()
+    stop_event = threading.Event()
+    player = SoundPlayer(stop_event, backend)
+    player.start()
+    player.play(sound)
+    if then is not None:
+        time.sleep(after)
+        player.play(then)
+    deadline = time.monotonic() + 2
+    stops = 2 if then is not None else 1
+    while time.monotonic() < deadline and [action for _, action, _ in backend.timeline].count("stop") < stops:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    stop_event.set()
+    player.join()
+    return backend.timeline
+
+
+def main():
+    check = Checks()
+
+    def frequencies(timeline) -> list[float]:
+        return [value for _, action, value in timeline if action == "frequency"]
+
+    for name, sound in (("BEEP", BEEP), ("PLING", PLING), ("WRONG", WRONG)):
+        timeline = play(sound)
+        took = timeline[-1][0] - timeline[0][0]
+        expected = sum(tone.duration for tone in sound)
+        print(f"{name}: {len(timeline)} buzzer calls over {took * 1000:.0f}ms")
+        check("every tone is played in order", frequencies(timeline) == [tone.frequency for tone in sound])
+        check("lasts the sum of its tones", expected <= took < expected + 0.05)
+        check("ends with the buzzer off", timeline[-1][1] == "stop")
+
+    print("A tone returning to an earlier frequency")
+    sound = (Tone(1000, 0.05, 50), Tone(1500, 0.05, 50), Tone(1000, 0.05, 50))
+    timeline = play(sound)
+    print("  " + ", ".join(f"{action} {value:g}" if value is not None else action for _, action, value in timeline))
+    check("switches back to the first frequency", frequencies(timeline) == [1000, 1500, 1000])
+
+    print("WRONG preempted by BEEP after 100 ms")
+    timeline = play(WRONG, BEEP, 0.1)
+    stops = [at for at, action, _ in timeline if action == "stop"]
+    print(f"  first sound stopped at {stops[0] * 1000:.0f}ms")
+    check("the first sound is cut short", stops[0] < sum(tone.duration for tone in WRONG) - 0.1)
+    check("the new sound is played in full", frequencies(timeline)[-1] == BEEP[-1].frequency)
+
+    check.exit()
+
+
+if __name__ == "__main__":
+    main()
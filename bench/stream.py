@@ -0,0 +1,111 @@
+import argparse
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from bench._util import Checks, percentile
+from bench.stub_api import StubApi
+
+
+def wait_for_update(events: queue.Queue, ready, timeout: float) -> float | None:
+    # Seconds until an update for which ready(workstations) holds, None if it never came
+    start = time.monotonic()
+    while (remaining := start + timeout - time.monotonic()) > 0:
+        try:
+            msg = events.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if ready(msg.payload):
+            return time.monotonic() - start
+    return None
+
+
+def occupied(workstation_id: int):
+    return lambda workstations: workstations is not None and any(ws.id == workstation_id and ws.occupied
+                                                                  for ws in workstations)
+
+
+def measure_staleness(stub: StubApi, poller, events: queue.Queue, changes: int, first_id: int,
+                      rng: random.Random) -> list[float]:
+    samples = []
+    for workstation_id in range(first_id, first_id + changes):
+        time.sleep(rng.uniform(0, poller.interval))
+        stub.state.add_entry(f"ist1{workstation_id:06d}", workstation_id)
+        delay = wait_for_update(events, occupied(workstation_id), poller.interval * 3)
+        samples.append((delay if delay is not None else poller.interval * 3) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare streamed and polled workstation updates against the stub API")
+    parser.add_argument("--changes", type=int, default=10, help="seat changes to time per mode")
+    parser.add_argument("--interval", type=float, default=5, help="poll interval in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="show the poller's logs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    stub = StubApi(latency=0.01, workstations=args.changes * 2 + 10, keepalive=1).start()
+    os.environ["BASE_API_URL"] = stub.url
+    from api_clients.workstations import WorkstationPoller
+
+    rng = random.Random(args.seed)
+    check = Checks()
+
+    def start_poller(stream_endpoint: str | None, **kwargs):
+        events, stop_event = queue.Queue(), threading.Event()
+        poller = WorkstationPoller(events, stop_event, args.interval, fast_window=0, stream_endpoint=stream_endpoint,
+                                   keepalive_timeout=3, **kwargs)
+        poller.start()
+        wait_for_update(events, lambda workstations: workstations is not None, 10)
+        return poller, events, stop_event
+
+    print(f"Polling every {args.interval:g}s")
+    poller, events, stop_event = start_poller(None)
+    polled = measure_staleness(stub, poller, events, args.changes, 1, rng)
+    stop_event.set()
+    print(f"  change to update: p50={percentile(polled, 0.5):.0f}ms max={max(polled):.0f}ms")
+
+    print("Streaming")
+    poller, events, stop_event = start_poller("workstations/stream", stream_retry=3)
+    streamed = measure_staleness(stub, poller, events, args.changes, args.changes + 1, rng)
+    print(f"  change to update: p50={percentile(streamed, 0.5):.0f}ms max={max(streamed):.0f}ms")
+    check("streamed changes arrive within 500 ms", max(streamed) < 500)
+
+    print("Dropped stream: changes made while disconnected are replayed on resume")
+    snapshots = stub.state.snapshots
+    stub.down = True
+    stub.drop_streams()
+    while poller.streaming:
+        time.sleep(0.01)
+    stub.state.add_entry("ist1999998", args.changes * 2 + 1)
+    stub.state.add_entry("ist1999999", args.changes * 2 + 2)
+    stub.down = False
+    delay = wait_for_update(events, occupied(args.changes * 2 + 2), 10)
+    print(f"  resumed in {delay * 1000:.0f}ms" if delay is not None else "  never resumed")
+    check("stream resumes from the last event id", delay is not None and stub.state.snapshots == snapshots)
+    check("resumed data matches the API", poller.last_event_id == str(stub.state.version))
+
+    print("No stream on the API: the poller falls back to polling and then comes back")
+    stub.stream_enabled = False
+    stub.drop_streams()
+    stub.state.add_entry("ist1999997", args.changes * 2 + 3)
+    delay = wait_for_update(events, occupied(args.changes * 2 + 3), args.interval * 3)
+    print(f"  polled update after {delay * 1000:.0f}ms" if delay is not None else "  no update")
+    check("polling takes over", delay is not None and not poller.streaming)
+    stub.stream_enabled = True
+    deadline = time.monotonic() + poller.stream_retry + args.interval * 2
+    while not poller.streaming and time.monotonic() < deadline:
+        time.sleep(0.1)
+    check("stream is picked up again", poller.streaming)
+
+    stop_event.set()
+    stub.stop()
+    check.exit()
+
+
+if __name__ == "__main__":
+    main()
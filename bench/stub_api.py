@@ -0,0 +1,239 @@
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORKSTATIONS = 38
+STREAM_RETRY_MS = 500
+
+
+class StubState:
+    def __init__(self, workstations: int = WORKSTATIONS):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.workstations = {i: {"id": i, "name": str(i), "capacity": 1 if i % 3 else 2, "occupation": 0}
+                             for i in range(1, workstations + 1)}
+        self.entries: dict[str, tuple[int, int]] = {} # ist_id -> (entry_id, workstation_id)
+        self.next_entry = 1
+        self.version = 1
+        self.changes: deque[tuple[int, dict]] = deque(maxlen=1000) # (version, workstation) for resuming streams
+        self.snapshots = 0
+        self.unknown_cards: set[int] = set()
+
+    @staticmethod
+    def student_for(card_id: int) -> str:
+        return f"ist1{card_id % 1000000:06d}"
+
+    def active_entry(self, card_id: int) -> dict:
+        with self.lock:
+            if card_id in self.unknown_cards:
+                return {"code": "STUDENT_NOT_FOUND"}
+            ist_id = self.student_for(card_id)
+            entry = self.entries.get(ist_id)
+            if entry is None:
+                return {"code": "NO_ACTIVE_ENTRY", "student": {"istId": ist_id}}
+            return {"code": "ACTIVE_ENTRY_FOUND", "entry": {"id": entry[0]}, "student": {"istId": ist_id}}
+
+    def add_entry(self, ist_id: str, workstation_id: int) -> bool:
+        with self.lock:
+            if ist_id in self.entries or workstation_id not in self.workstations:
+                return False
+            self.entries[ist_id] = (self.next_entry, workstation_id)
+            self.next_entry += 1
+            self.workstations[workstation_id]["occupation"] += 1
+            self.record_change(workstation_id)
+            return True
+
+    def close_entry(self, entry_id: int) -> bool:
+        with self.lock:
+            for ist_id, (current_id, workstation_id) in self.entries.items():
+                if current_id == entry_id:
+                    del self.entries[ist_id]
+                    self.workstations[workstation_id]["occupation"] -= 1
+                    self.record_change(workstation_id)
+                    return True
+            return False
+
+    def record_change(self, workstation_id: int):
+        # Called with the lock held
+        self.version += 1
+        self.changes.append((self.version, dict(self.workstations[workstation_id])))
+        self.changed.notify_all()
+
+    def events_since(self, version: int | None, timeout: float) -> tuple[list[str], int]:
+        # Server-sent events for what changed after version, or a snapshot when it is too old to resume from
+        with self.changed:
+            oldest = self.changes[0][0] - 1 if self.changes else self.version
+            if version is None or not oldest <= version <= self.version:
+                self.snapshots += 1
+                snapshot = json.dumps(list(self.workstations.values()))
+                return [f"id: {self.version}\nevent: snapshot\ndata: {snapshot}\n\n"], self.version
+            if self.version == version:
+                self.changed.wait(timeout)
+            events = [f"id: {changed}\nevent: workstation\ndata: {json.dumps(ws)}\n\n"
+                      for changed, ws in self.changes if changed > version]
+            return events, self.version
+
+    def workstation_list(self) -> tuple[int, list[dict]]:
+        with self.lock:
+            return self.version, [dict(ws) for ws in self.workstations.values()]
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass # Clients giving up on injected delays close their sockets mid-response
+
+
+class StubApi:
+    # A stand-in for the LEMAC API with latency and error injection, for benchmarks and manual testing
+    def __init__(self, port: int = 0, latency: float = 0.02, slow_fraction: float = 0, slow_latency: float = 3,
+                 error_rate: float = 0, workstations: int = WORKSTATIONS, keepalive: float = 15):
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.down = False
+        self.keepalive = keepalive
+        self.stream_enabled = True
+        self.closed = False
+        self.state = StubState(workstations)
+        self.requests = 0
+        self.server = QuietServer(("127.0.0.1", port), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/"
+
+    def start(self) -> "StubApi":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.closed = True
+        self.drop_streams()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def delay(self) -> float:
+        if random.random() < self.slow_fraction:
+            return self.slow_latency
+        return self.latency
+
+    def drop_streams(self):
+        # Open streams notice at their next write, so wake them up
+        with self.state.changed:
+            self.state.changed.notify_all()
+
+    def streaming(self) -> bool:
+        return self.stream_enabled and not self.closed and not self.down
+
+    def fails(self) -> bool:
+        return self.down or random.random() < self.error_rate
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def body(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def reply(self, status: int, payload=None, headers: dict | None = None):
+                data = b"" if payload is None else json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(data)
+
+            def send_chunk(self, text: str):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def stream_workstations(self):
+                last_event_id = self.headers.get("Last-Event-ID")
+                version = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    self.send_chunk(f"retry: {STREAM_RETRY_MS}\n\n")
+                    # A stream in progress ends when the stub goes down, like a dropped connection
+                    while stub.streaming():
+                        events, version = stub.state.events_since(version, stub.keepalive)
+                        if stub.streaming():
+                            self.send_chunk("".join(events) or ": keep-alive\n\n")
+                    self.send_chunk("")
+                except OSError:
+                    pass
+
+            def handle_request(self):
+                body = self.body()
+                stub.requests += 1
+                time.sleep(stub.delay())
+                if stub.fails():
+                    return self.reply(503, {"error": "injected"})
+
+                path = self.path.removeprefix("/")
+                if self.command == "HEAD":
+                    return self.reply(200)
+                if self.command == "GET" and path == "workstations":
+                    version, workstations = stub.state.workstation_list()
+                    etag = f'"{version}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        return self.reply(304, headers={"ETag": etag})
+                    return self.reply(200, workstations, {"ETag": etag})
+                if self.command == "GET" and path == "workstations/stream" and stub.stream_enabled:
+                    return self.stream_workstations()
+                if self.command == "GET" and path == "reader/active-entry":
+                    return self.reply(200, stub.state.active_entry(body["mifareNumber"]))
+                if self.command == "POST" and path == "reader/add-entry":
+                    added = stub.state.add_entry(body["istId"], body["workstationId"])
+                    return self.reply(200 if added else 409, {})
+                if self.command == "PUT" and path.startswith("reader/close-entry/"):
+                    closed = stub.state.close_entry(int(path.rsplit("/", 1)[1]))
+                    return self.reply(200 if closed else 404, {})
+                return self.reply(404, {})
+
+            do_GET = do_POST = do_PUT = do_HEAD = handle_request
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stub LEMAC API")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--slow-fraction", type=float, default=0)
+    parser.add_argument("--slow-latency", type=float, default=3)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    stub = StubApi(args.port, args.latency, args.slow_fraction, args.slow_latency, args.error_rate).start()
+    print(f"Stub LEMAC API listening on {stub.url}")
+    try:
+        stub.thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
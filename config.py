@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+import json
 import os
 from importlib.metadata import version
 
@@ -7,4 +8,29 @@ load_dotenv()
 VERSION = "1.1.0"
 BASE_API_URL = os.getenv("BASE_API_URL")
 API_KEY = os.getenv("API_KEY")
-LOG_FILE = os.getenv("LOG_FILE")
\ No newline at end of file
+LOG_FILE = os.getenv("LOG_FILE")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text") # text, or json for one JSON object per line
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "4"))
+WORKSTATION_STREAM = os.getenv("WORKSTATION_STREAM") # SSE endpoint for occupancy changes, unset to only poll
+API_WORKERS = int(os.getenv("API_WORKERS", "3"))
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", "journal.db")
+CARD_READER = os.getenv("CARD_READER", "auto") # auto, irq, polling, simulated, socket, fifo, stdin or replay
+CARD_READER_SOURCE = os.getenv("CARD_READER_SOURCE") # socket or FIFO path, or scan log to replay
+CARD_REPLAY_SPEED = float(os.getenv("CARD_REPLAY_SPEED", "1"))
+# JSON list of readers driven by this process, e.g. [{"id": "north", "spi_device": 0}, {"id": "south", "spi_device": 1,
+# "buzzer_pin": 15, "geometry": "+1920+0"}]. Unset fields fall back to the CARD_READER* settings above.
+READERS = json.loads(os.getenv("READERS") or "[]")
+CARD_READER_IRQ_PIN = int(os.getenv("CARD_READER_IRQ_PIN")) if os.getenv("CARD_READER_IRQ_PIN") else None
+CARD_DEBOUNCE_MS = int(os.getenv("CARD_DEBOUNCE_MS", "1500"))
+RESULT_DWELL_MS = int(os.getenv("RESULT_DWELL_MS", "3000")) # seat reserved and entry closed screens
+ERROR_DWELL_MS = int(os.getenv("ERROR_DWELL_MS", "3000")) # not found, renewal, service unavailable and error screens
+SEAT_CHOICE_TIMEOUT_MS = int(os.getenv("SEAT_CHOICE_TIMEOUT_MS", "60000")) # room map left open by a student who walked away
+WORKSTATION_FRESH_SECONDS = float(os.getenv("WORKSTATION_FRESH_SECONDS", "1.5")) # older data is refreshed when a card is scanned
+WORKSTATION_REFRESH_WAIT_MS = int(os.getenv("WORKSTATION_REFRESH_WAIT_MS", "500")) # room map waits this long for a refresh
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", "assets_cache")
+ROOM_LAYOUT = os.getenv("ROOM_LAYOUT", "gui/layout.json")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0")) # 0 disables the /metrics endpoint
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE") # e.g. for node_exporter's textfile collector
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles") # where captured profiles are written
+PROFILE_SOCKET = os.getenv("PROFILE_SOCKET") # local socket to trigger a profile, unset to only use SIGUSR1
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "10"))
\ No newline at end of file
@@ -0,0 +1,124 @@
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+TEXT_FORMAT = "%(asctime)s [%(name)s] - %(levelname)s - %(message)s"
+DATE_FORMAT = "%H:%M:%S"
+
+
+class JsonFormatter(logging.Formatter):
+    # One compact JSON object per line, for shipping to a log collector
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+
+
+class LazyQueueHandler(QueueHandler):
+    # Hands the record over as is, the message is formatted by the writer thread instead of the caller. Arguments
+    # are therefore read later, so callers must not mutate what they pass to a log call.
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Losing a log line beats stalling the GUI or a card read behind a slow SD card
+            self.dropped += 1
+
+
+class BatchedFlushMixin:
+    # StreamHandler flushes after every record; the writer flushes once per batch instead
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class BatchedStreamHandler(BatchedFlushMixin, logging.StreamHandler):
+    pass
+
+
+class BatchedRotatingFileHandler(BatchedFlushMixin, RotatingFileHandler):
+    pass
+
+
+class LogWriter(threading.Thread):
+    def __init__(self, log_queue: queue.Queue, handlers: list[logging.Handler], batch_size: int = 256,
+                 flush_interval: float = 0.5):
+        super().__init__(name="LogWriter", daemon=True)
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.is_set() or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+    def write(self, batch: list[logging.LogRecord]):
+        for record in batch:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        for handler in self.handlers:
+            if isinstance(handler, BatchedFlushMixin):
+                handler.flush_batch()
+
+    def stop(self, timeout: float = 5):
+        self.stopping.set()
+        self.join(timeout)
+        for handler in self.handlers:
+            handler.close()
+
+
+def setup_logging(level: int, log_file: str | None, log_format: str = "text", queue_size: int = 10000) -> LogWriter:
+    # Every logger call only puts the record on a queue; formatting, console output and the rotating file on the
+    # SD card are handled by one background thread
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+    handlers: list[logging.Handler] = [BatchedStreamHandler()]
+    if log_file:
+        handlers.append(BatchedRotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=7,
+                                                   encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(queue_size)
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+
+    writer = LogWriter(log_queue, handlers)
+    writer.start()
+    return writer
+
+
+def dropped_records() -> int:
+    return sum(handler.dropped for handler in logging.getLogger().handlers if isinstance(handler, LazyQueueHandler))
@@ -0,0 +1,220 @@
+import bisect
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+# Seconds, tuned for a kiosk where anything over a second is noticeable
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def label_string(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{escape(str(value))}"' for label, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        # As strings, so a status code and an exception name under one label still sort together
+        label_values = tuple(map(str, label_values))
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            values = sorted(self.values.items())
+        return [f"{self.name}{self.label_string(labels)} {value}" for labels, value in values]
+
+
+class Gauge(Metric):
+    # Sampled on every scrape, so queue depths cost nothing between scrapes
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self.read: Callable[[], float] | None = None
+
+    def set_function(self, read: Callable[[], float]):
+        self.read = read
+
+    def samples(self) -> list[str]:
+        if self.read is None:
+            return []
+        try:
+            return [f"{self.name} {self.read()}"]
+        except Exception:
+            return []
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self.series: dict[tuple, list] = {} # label values -> [bucket counts, sum, count]
+
+    def observe(self, value: float, *label_values):
+        label_values = tuple(map(str, label_values))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self.series.items())
+        lines = []
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self.label_string(labels, bucket_label(bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{self.label_string(labels, bucket_label('+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{self.label_string(labels)} {total}")
+            lines.append(f"{self.name}_count{self.label_string(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def bucket_label(bound) -> str:
+    return f'le="{bound}"'
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = Registry()
+
+EVENT_QUEUE_SECONDS = Histogram("lemac_event_queue_seconds", "Time a message waited in the GUI event queue", ("type",))
+DISPATCH_SECONDS = Histogram("lemac_dispatch_seconds", "Time spent in the GUI handler of a message", ("type",))
+API_JOB_QUEUE_SECONDS = Histogram("lemac_api_job_queue_seconds", "Time an API job waited for a worker", ("job",))
+API_JOB_SECONDS = Histogram("lemac_api_job_seconds", "Time an API worker spent on a job", ("job",))
+API_JOB_ERRORS = Counter("lemac_api_job_errors_total", "API jobs that ended in an error", ("job", "error"))
+HTTP_REQUEST_SECONDS = Histogram("lemac_http_request_seconds", "Duration of a single HTTP attempt", ("endpoint",))
+HTTP_REQUESTS = Counter("lemac_http_requests_total", "HTTP attempts by endpoint and status code", ("endpoint", "code"))
+WORKSTATION_POLL_SECONDS = Histogram("lemac_workstation_poll_seconds", "Duration of a workstation poll", ("result",))
+WORKSTATION_REFRESHES = Counter("lemac_workstation_refreshes_total", "Workstation refreshes asked for by a card scan",
+                                ("result",))
+SCREEN_PAINT_SECONDS = Histogram("lemac_screen_paint_seconds", "Time from a screen switch until it is painted", ("screen",))
+SCAN_TO_SCREEN_SECONDS = Histogram("lemac_scan_to_screen_seconds", "Time from a card scan until its answer is painted",
+                                   ("outcome",))
+EVENT_QUEUE_DEPTH = Gauge("lemac_event_queue_depth", "Messages waiting for the GUI thread")
+API_QUEUE_DEPTH = Gauge("lemac_api_queue_depth", "API jobs waiting for a worker")
+JOURNAL_FAILED = Counter("lemac_journal_failed_total", "Entry changes the API rejected for good", ("type",))
+JOURNAL_PENDING = Gauge("lemac_journal_pending", "Entry changes not yet sent to the API")
+THREAD_STALLS = Counter("lemac_thread_stalls_total", "Times a thread's loop missed its heartbeat deadline", ("thread",))
+ROOM_LAYOUT_MISSING = Gauge("lemac_room_layout_missing", "Layout workstations the API does not know, drawn as missing")
+ROOM_LAYOUT_UNPLACED = Gauge("lemac_room_layout_unplaced", "API workstations not in the room layout, cannot be chosen")
+LOG_RECORDS_DROPPED = Gauge("lemac_log_records_dropped", "Log records dropped because the log writer fell behind")
+
+
+class MetricsServer(threading.Thread):
+    def __init__(self, stop_event: threading.Event, port: int, registry: Registry = REGISTRY):
+        super().__init__(name="MetricsServer", daemon=True)
+        self.logger = logging.getLogger("METRICS")
+        self.stop_event = stop_event
+        self.registry = registry
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+
+    def run(self):
+        self.logger.info(f"Serving metrics on http://127.0.0.1:{self.server.server_port}/metrics")
+        watcher = threading.Thread(target=self._shutdown_on_stop, daemon=True)
+        watcher.start()
+        self.server.serve_forever()
+        self.server.server_close()
+
+    def _shutdown_on_stop(self):
+        self.stop_event.wait()
+        self.server.shutdown()
+
+    def _handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                data = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+class MetricsTextfileWriter(threading.Thread):
+    # For node_exporter's textfile collector, written atomically so it never reads half a file
+    def __init__(self, stop_event: threading.Event, path: str, interval: float = 15, registry: Registry = REGISTRY):
+        super().__init__(name="MetricsTextfile", daemon=True)
+        self.logger = logging.getLogger("METRICS")
+        self.stop_event = stop_event
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
+        self.write()
+
+    def write(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.registry.render())
+            os.replace(tmp, self.path)
+        except Exception as err:
+            # Never let one bad write end the thread, the next interval tries again
+            self.logger.warning(f"Failed to write metrics to {self.path}: {err}")
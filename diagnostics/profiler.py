@@ -0,0 +1,249 @@
+import faulthandler
+import gzip
+import logging
+import os
+import signal
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+from diagnostics.metrics import THREAD_STALLS
+
+MAX_SECONDS = 120 # longest capture, a trigger asking for more gets this much
+
+class Heartbeats:
+    # Every loop beats with how long it may take until its next beat, and marks itself idle before a wait that has
+    # no bound (e.g. a card reader parked while the room map is open), so only loops that overran are reported
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.threads: dict[int, list] = {} # ident -> [name, last beat, deadline, idle]
+
+    def beat(self, deadline: float):
+        thread = threading.current_thread()
+        self.threads[thread.ident] = [thread.name, time.monotonic(), deadline, False]
+
+    def idle(self):
+        entry = self.threads.get(threading.get_ident())
+        if entry is not None:
+            entry[3] = True
+
+    def lags(self) -> list[tuple[int, str, float, float, bool]]:
+        # (ident, name, seconds since the last beat, deadline, idle), threads that ended are forgotten
+        now = time.monotonic()
+        alive = sys._current_frames().keys()
+        with self.lock:
+            for ident in self.threads.keys() - alive:
+                del self.threads[ident]
+            return sorted(((ident, name, now - last, deadline, idle)
+                           for ident, (name, last, deadline, idle) in list(self.threads.items())),
+                          key=lambda lag: lag[1])
+
+    def report(self) -> list[str]:
+        lines = [f"{'thread':<24} {'lag':>8} {'deadline':>9} state"]
+        for _, name, lag, deadline, idle in self.lags():
+            state = "idle" if idle else "STALLED" if lag > deadline else "ok"
+            lines.append(f"{name:<24} {lag * 1000:>6.0f}ms {deadline * 1000:>7.0f}ms {state}")
+        return lines
+
+
+HEARTBEATS = Heartbeats()
+
+
+class Watchdog(threading.Thread):
+    # Logs a loop once when it misses its deadline, with the stack it is stuck in, and again when it recovers
+    def __init__(self, stop_event: threading.Event, interval: float = 1, heartbeats: Heartbeats = HEARTBEATS):
+        super().__init__(name="Watchdog", daemon=True)
+        self.logger = logging.getLogger("WATCHDOG")
+        self.stop_event = stop_event
+        self.interval = interval
+        self.heartbeats = heartbeats
+        self.stalled: dict[int, float] = {} # ident -> lag when first reported
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        frames = sys._current_frames()
+        lags = self.heartbeats.lags()
+        for ident in self.stalled.keys() - {lag[0] for lag in lags}:
+            del self.stalled[ident]
+        for ident, name, lag, deadline, idle in lags:
+            if not idle and lag > deadline:
+                if ident not in self.stalled:
+                    self.stalled[ident] = lag
+                    THREAD_STALLS.inc(name)
+                    stack = "".join(traceback.format_stack(frames[ident])) if ident in frames else ""
+                    self.logger.warning(f"{name} missed its {deadline:.1f}s deadline, last beat {lag:.1f}s ago:\n{stack}")
+            elif ident in self.stalled:
+                del self.stalled[ident]
+                self.logger.warning(f"{name} is beating again.")
+
+
+def thread_names() -> dict[int, str]:
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+
+def thread_stacks() -> list[str]:
+    names = thread_names()
+    lines = []
+    for ident, frame in sys._current_frames().items():
+        lines.append(f"Thread {names.get(ident, ident)} ({ident}):")
+        lines.extend(line.rstrip("\n") for line in traceback.format_stack(frame))
+        lines.append("")
+    return lines
+
+
+def sample(duration: float, interval: float) -> tuple[Counter, int]:
+    # Folded stacks of every other thread, "thread;outermost;...;innermost" -> samples, as read by flamegraph tools
+    stacks = Counter()
+    labels: dict[tuple, str] = {}
+    me = threading.get_ident()
+    samples = 0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        names = thread_names()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append((frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            stacks[(names.get(ident, str(ident)), tuple(reversed(frames)))] += 1
+        samples += 1
+        time.sleep(interval)
+
+    folded = Counter()
+    for (name, frames), count in stacks.items():
+        parts = [name]
+        for code, line in frames:
+            label = labels.get((code, line))
+            if label is None:
+                label = labels[(code, line)] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{line})"
+            parts.append(label)
+        folded[";".join(parts)] += count
+    return folded, samples
+
+
+class Profiler:
+    # Writes the heartbeats, a stack dump and a sampling profile of all threads to one gzipped text file per capture
+    def __init__(self, directory: str, seconds: float = 10, interval: float = 0.01, version: str = ""):
+        self.logger = logging.getLogger("PROFILER")
+        self.directory = directory
+        self.seconds = seconds
+        self.interval = interval
+        self.version = version
+        self.lock = threading.Lock()
+
+    def capture(self, seconds: float | None = None) -> str | None:
+        # One capture at a time, a second trigger while one runs is dropped rather than skewing both
+        if not self.lock.acquire(blocking=False):
+            self.logger.warning("A profile is already being captured.")
+            return None
+        try:
+            if seconds is None or not seconds > 0:
+                seconds = self.seconds
+            seconds = min(seconds, MAX_SECONDS)
+            self.logger.info(f"Capturing a {seconds:g}s profile of all threads...")
+            heartbeats = HEARTBEATS.report()
+            stacks = thread_stacks()
+            folded, samples = sample(seconds, self.interval)
+
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"lemac-profile-{datetime.now():%Y%m%d-%H%M%S-%f}.txt.gz")
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                f.write(f"# lemac-card-reader {self.version} pid {os.getpid()} at {datetime.now().isoformat()}, "
+                        f"{samples} samples every {self.interval * 1000:g}ms over {seconds:g}s\n")
+                f.write("## heartbeats\n" + "\n".join(heartbeats) + "\n")
+                f.write("## stacks\n" + "\n".join(stacks) + "\n")
+                f.write("## profile\n")
+                for stack, count in folded.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.logger.info(f"Profile written to {path}")
+            return path
+        except Exception as err:
+            self.logger.error(f"Profile capture failed with error: {err}")
+            return None
+        finally:
+            self.lock.release()
+
+    def capture_in_background(self, seconds: float | None = None):
+        threading.Thread(target=self.capture, args=(seconds,), name="Profiler", daemon=True).start()
+
+    def install_signal(self, signum: int = getattr(signal, "SIGUSR1", 0)):
+        # The handler runs on the main thread between bytecodes, so it only starts the capture. If Tk is stuck inside
+        # C code the handler waits with it, which is what the socket and faulthandler's dump are for.
+        if not signum:
+            return
+        signal.signal(signum, lambda signum, frame: self.capture_in_background())
+        self.logger.info(f"Send {signal.Signals(signum).name} to pid {os.getpid()} to capture a profile.")
+        if hasattr(signal, "SIGUSR2"):
+            # Dumps every thread's stack to stderr from C, even while the main thread is stuck
+            faulthandler.register(signal.SIGUSR2, all_threads=True)
+
+
+class ProfilerServer(threading.Thread):
+    # A local socket, e.g. `echo "profile 30" | nc -U <path>`. Commands: profile [seconds], stacks, heartbeats
+    def __init__(self, stop_event: threading.Event, path: str, profiler: Profiler):
+        super().__init__(name="ProfilerServer", daemon=True)
+        self.logger = logging.getLogger("PROFILER")
+        self.stop_event = stop_event
+        self.path = path
+        # Bound inside a directory only the owner can enter and made owner only before it is moved into place, so
+        # no other user can connect to it at any point
+        private = tempfile.mkdtemp(prefix=".lemac-profiler-", dir=os.path.dirname(os.path.abspath(path)))
+        bound = os.path.join(private, "socket")
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(bound, self._handler(profiler))
+            os.chmod(bound, 0o600)
+            os.replace(bound, path)
+        finally:
+            if os.path.lexists(bound):
+                os.unlink(bound)
+            os.rmdir(private)
+        self.server.daemon_threads = True
+
+    def run(self):
+        self.logger.info(f"Profiler listening on {self.path}")
+        watcher = threading.Thread(target=self._shutdown_on_stop, daemon=True)
+        watcher.start()
+        self.server.serve_forever()
+        self.server.server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _shutdown_on_stop(self):
+        self.stop_event.wait()
+        self.server.shutdown()
+
+    def _handler(self, profiler: Profiler):
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                command, *args = self.rfile.readline(256).decode(errors="replace").split() or [""]
+                if command == "profile":
+                    try:
+                        seconds = float(args[0]) if args else None
+                    except ValueError:
+                        seconds = None
+                    path = profiler.capture(seconds)
+                    lines = [path or "A profile is already being captured or failed, see the log."]
+                elif command == "stacks":
+                    lines = thread_stacks()
+                elif command == "heartbeats":
+                    lines = HEARTBEATS.report()
+                else:
+                    lines = ["Commands: profile [seconds], stacks, heartbeats"]
+                try:
+                    self.wfile.write(("\n".join(lines) + "\n").encode())
+                except OSError:
+                    pass
+
+        return Handler
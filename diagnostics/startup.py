@@ -0,0 +1,39 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Imported first by main.py, so this is as close to interpreter start as we can measure
+PROCESS_START = time.perf_counter()
+
+
+class StartupProfile:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases: list[tuple[str, str, float, float]] = [] # (name, thread, start, end) since PROCESS_START
+        self.marks: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.phases.append((name, threading.current_thread().name,
+                                    start - PROCESS_START, end - PROCESS_START))
+
+    def mark(self, name: str):
+        with self.lock:
+            self.marks.append((name, time.perf_counter() - PROCESS_START))
+
+    def report(self) -> list[str]:
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[2])
+            marks = list(self.marks)
+        lines = [f"{'phase':<28} {'thread':<14} {'start':>8} {'took':>8}"]
+        for name, thread, start, end in phases:
+            lines.append(f"{name:<28} {thread:<14} {start * 1000:>6.0f}ms {(end - start) * 1000:>6.0f}ms")
+        for name, at in marks:
+            lines.append(f"{name:<28} {'':<14} {at * 1000:>6.0f}ms")
+        return lines
@@ -0,0 +1,81 @@
+import hashlib
+import logging
+import os
+import tkinter as tk
+from functools import cached_property
+from pathlib import Path
+
+
+class AssetCache:
+    # Resized images are stored as PNGs that Tk decodes natively, so warm starts skip Pillow
+    def __init__(self, cache_dir: str):
+        self.logger = logging.getLogger("ASSETS")
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str, ratio: float, screen_width: int, screen_height: int) -> tk.PhotoImage:
+        try:
+            return tk.PhotoImage(file=self.resized(path, ratio, screen_width, screen_height))
+        except (OSError, tk.TclError) as err:
+            self.logger.warning(f"Asset cache unavailable for {path}, resizing in memory: {err}")
+            return resize_in_memory(path, ratio, screen_width)
+
+    def lazy(self, path: str, ratio: float, screen_width: int, screen_height: int) -> "LazyAsset":
+        return LazyAsset(self, path, ratio, screen_width, screen_height)
+
+    def resized(self, path: str, ratio: float, screen_width: int, screen_height: int) -> str:
+        source = Path(path)
+        digest = hashlib.sha1(source.read_bytes()).hexdigest()[:16]
+        prefix = f"{source.stem}-{ratio}-"
+        cached = self.cache_dir / f"{prefix}{screen_width}x{screen_height}-{digest}.png"
+        if cached.exists():
+            self.hits += 1
+            return str(cached)
+
+        self.misses += 1
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        resized = resize(source, ratio, screen_width)
+        tmp = cached.with_suffix(".tmp")
+        resized.save(tmp, format="PNG")
+        os.replace(tmp, cached)
+        self.logger.info(f"Cached {source.name} resized to {resized.size[0]}x{resized.size[1]}")
+
+        # Entries for an older source are never read again. Other screen sizes stay, readers with monitors of their
+        # own share the cache.
+        for stale in self.cache_dir.glob(f"{prefix}*.png"):
+            if not stale.name.endswith(f"-{digest}.png"):
+                stale.unlink(missing_ok=True)
+        return str(cached)
+
+
+class LazyAsset:
+    def __init__(self, cache: AssetCache, path: str, ratio: float, screen_width: int, screen_height: int):
+        self.cache = cache
+        self.args = (path, ratio, screen_width, screen_height)
+
+    @cached_property
+    def image(self) -> tk.PhotoImage:
+        return self.cache.load(*self.args)
+
+    def width(self) -> int:
+        return self.image.width()
+
+    def height(self) -> int:
+        return self.image.height()
+
+
+def resize(source: Path, ratio: float, screen_width: int):
+    from PIL import Image
+
+    image = Image.open(source)
+    new_width = int(screen_width * ratio)
+    w_percent = (new_width / float(image.size[0]))
+    new_height = int((float(image.size[1]) * float(w_percent)))
+    return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+
+def resize_in_memory(path: str, ratio: float, screen_width: int):
+    from PIL import ImageTk
+
+    return ImageTk.PhotoImage(resize(Path(path), ratio, screen_width))
@@ -1,17 +1,23 @@
 import logging
 import queue
 import threading
+import time
 import tkinter as tk
 
-from PIL import Image, ImageTk
+import gui.screens as screens
+from config import ASSET_CACHE_DIR, ROOM_LAYOUT
+from gui.assets import AssetCache
+from gui.layout import load_layout
 from gui.room_map import RoomMap
-from obj.objects import Workstation
+from gui.screens import Screens, FrameTimer
+from obj.objects import Workstation, Message, MessageType
 
 
 class AppGui:
-    def __init__(self, root: tk.Tk, events: queue.Queue, stop_event: threading.Event, ready_event: threading.Event,
-                 version: str):
+    def __init__(self, root: tk.Tk | tk.Toplevel, events: queue.Queue, stop_event: threading.Event,
+                 ready_event: threading.Event, version: str, reader_id: str | None = None, geometry: str | None = None):
         self.logger = logging.getLogger("GUI")
+        self.reader_id = reader_id
 
         self.root = root
         self.events = events
@@ -20,22 +26,31 @@ class AppGui:
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        self.root.title("Workstation Monitor")
+        self.root.title("Workstation Monitor" + (f" - {reader_id}" if reader_id else ""))
+        if geometry is not None:
+            # Readers sharing one X screen each get their own monitor, given as WIDTHxHEIGHT+X+Y
+            self.root.geometry(geometry)
         self.root.attributes("-fullscreen", True)
         self.root.update_idletasks()
 
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        self.root.geometry(f"{screen_width}x{screen_height}+0+0")
+        if geometry is not None and "x" in geometry:
+            screen_width, screen_height = (int(n) for n in geometry.split("+")[0].split("x"))
+        else:
+            screen_width = self.root.winfo_screenwidth()
+            screen_height = self.root.winfo_screenheight()
+            self.root.geometry(f"{screen_width}x{screen_height}+0+0")
 
         self.canvas = tk.Canvas(self.root, bg="white")
         self.canvas.pack(fill=tk.BOTH, expand=True)
 
         # Draw DEM logo
-        self.dem = get_resized_image("gui/images/dem.png", 0.13, screen_width, screen_height)
+        self.assets = AssetCache(ASSET_CACHE_DIR)
+        self.dem = self.assets.load("gui/images/dem.png", 0.13, screen_width, screen_height)
         self.canvas.create_image(10, 10, image=self.dem, anchor="nw")
 
-        self.room_map = RoomMap(self.logger, self.events, self.canvas)
+        # The zone tabs start right of the logo
+        self.room_map = RoomMap(self.logger, self.events, self.canvas, load_layout(ROOM_LAYOUT), reader_id,
+                                tabs_left=10 + self.dem.width() + 30)
 
         self.canvas.tag_bind("click", "<Enter>", lambda e: self.canvas.config(cursor="hand2"))
         self.canvas.tag_bind("click", "<Leave>", lambda e: self.canvas.config(cursor=""))
@@ -43,123 +58,67 @@ class AppGui:
         self.canvas.create_text(10, screen_height - 10, text="v" + version, font=("Arial", 10),
                                 fill="gray", anchor="sw")
 
-        self.qrcode = get_resized_image("gui/images/qrcode.png", 0.1, screen_width, screen_height)
-        self.qrcode_img = None
+        self.qrcode = self.assets.lazy("gui/images/qrcode.png", 0.1, screen_width, screen_height)
 
-        self.arrow = get_resized_image("gui/images/arrow.png", 0.05, screen_width, screen_height)
-        self.arrow_img = None
+        self.arrow = self.assets.lazy("gui/images/arrow.png", 0.05, screen_width, screen_height)
+
+        self.screens = Screens(self.canvas, self.qrcode, self.arrow)
+        self.frame_timer = FrameTimer(self.logger, self.canvas)
+        self.canvas.bind("<Configure>", lambda event: self.screens.refresh())
+        self.canvas.bind("<Button>", self.on_tap)
+
+    def on_tap(self, event):
+        # Taps on the room map are seat choices, anywhere else they skip the rest of a result screen
+        if not self.room_map.visible:
+            self.events.put(Message(MessageType.SCREEN_TAPPED, reader_id=self.reader_id))
+
+    def show_screen(self, name: str, text: str | None = None):
+        start = time.perf_counter()
+        self.room_map.hide()
+        self.canvas.config(cursor="none")
+        self.screens.show(name, text)
+        self.frame_timer.measure(name, start)
 
     def show_error(self, message):
-        clear_screen(self.canvas)
-        draw_center_text(self.canvas, message)
+        self.show_screen(screens.ERROR, message)
 
     def show_waiting(self):
-        clear_screen(self.canvas)
-        draw_center_text(self.canvas, "Waiting for card...")
-
-        self.canvas.create_text(
-            self.canvas.winfo_screenwidth() - 20 - self.qrcode.width() - self.arrow.width(),
-            10 + self.qrcode.height() // 2,
-            text="Student\nRegistration",
-            font=("Arial", 13),
-            fill="gray",
-            justify="center",
-            anchor="e",
-            tags=("temp",)
-        )
-
-        self.arrow_img = self.canvas.create_image(
-            self.canvas.winfo_screenwidth() - 10 - self.qrcode.width(),
-            10 + self.qrcode.height() // 2,
-            image=self.arrow,
-            anchor="e",
-            tags=("temp",)
-        )
-        self.qrcode_img = self.canvas.create_image(
-            self.canvas.winfo_screenwidth() - 10,
-            10,
-            image=self.qrcode,
-            anchor="ne",
-            tags=("temp",)
-        )
+        self.show_screen(screens.WAITING)
 
     def show_loading(self):
-        clear_screen(self.canvas)
-        draw_center_text(self.canvas, "Processing card...")
+        self.show_screen(screens.LOADING)
 
     def show_student_not_found(self):
-        clear_screen(self.canvas)
-        draw_title_subtitle(self.canvas, "Student not found",
-                            "Please register your student card via LEMAC's website")
+        self.show_screen(screens.STUDENT_NOT_FOUND)
 
     def show_student_requires_renewal(self):
-        clear_screen(self.canvas)
-        draw_title_subtitle(self.canvas, "Renewal Required",
-                            "Please renew your student registration via LEMAC's website")
+        self.show_screen(screens.RENEWAL_REQUIRED)
 
     def show_card_assigning(self):
-        clear_screen(self.canvas)
-        draw_title_subtitle(self.canvas, "Card Scanned",
-                            "After monitor's confirmation you can immediately start using your card")
+        self.show_screen(screens.CARD_ASSIGNING)
+
+    def show_service_unavailable(self):
+        self.show_screen(screens.SERVICE_UNAVAILABLE)
+
+    def show_room_map(self, workstation_data: list[Workstation], student_id: str, stale_for: float | None = None):
+        start = time.perf_counter()
+        self.screens.hide()
+        self.room_map.draw(workstation_data, student_id, stale_for)
+        self.frame_timer.measure("room_map", start)
 
-    def show_room_map(self, workstation_data: list[Workstation], student_id: str):
-        self.room_map.draw(workstation_data, student_id)
+    def update_room_map(self, workstation_data: list[Workstation], stale_for: float | None = None):
+        self.room_map.validate(workstation_data)
+        if self.room_map.visible:
+            self.room_map.update(workstation_data)
+            self.room_map.mark_stale(stale_for)
 
     def show_seat_reserved(self, ws_name: str):
-        clear_screen(self.canvas)
-        draw_title_subtitle(self.canvas, f"Seat {ws_name} reserved", "Please scan card on exit")
+        self.show_screen(screens.SEAT_RESERVED, f"Seat {ws_name} reserved")
 
     def show_entry_closed(self):
-        clear_screen(self.canvas)
-        draw_title_subtitle(self.canvas, "Entry Closed", "Thank you for your visit")
+        self.show_screen(screens.ENTRY_CLOSED)
 
     def on_close(self):
         self.stop_event.set()
         self.ready_event.set()
-        self.root.destroy()
-
-
-def clear_screen(canvas):
-    canvas.config(cursor="none")
-    canvas.delete("temp")
-
-
-def draw_center_text(canvas, text):
-    canvas.create_text(
-        canvas.winfo_width() // 2,
-        canvas.winfo_height() // 2,
-        text=text,
-        font=("Arial", 32),
-        fill="gray",
-        tags=("temp",)
-    )
-
-
-def draw_title_subtitle(canvas, title, subtitle):
-    canvas.create_text(
-            canvas.winfo_width() // 2,
-            canvas.winfo_height() // 2,
-            text=title,
-            font=("Arial", 32),
-            fill="gray",
-            anchor="s",
-            tags=("temp",)
-        )
-    canvas.create_text(
-        canvas.winfo_width() // 2,
-        canvas.winfo_height() // 2 + 5,
-        text=subtitle,
-        font=("Arial", 22),
-        fill="gray",
-        anchor="n",
-        tags=("temp",)
-    )
-
-
-def get_resized_image(path: str, ratio: float, screen_width: int, screen_height: int) -> ImageTk.PhotoImage:
-    image = Image.open(path)
-    new_width = int(screen_width * ratio)
-    w_percent = (new_width / float(image.size[0]))
-    new_height = int((float(image.size[1]) * float(w_percent)))
-    resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-    return ImageTk.PhotoImage(resized_image)
\ No newline at end of file
+        self.root.quit()
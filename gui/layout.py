@@ -0,0 +1,256 @@
+import bisect
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+
+from obj.objects import Workstation, WorkstationType
+
+DOOR = "D"
+SPACINGS = ("box_size", "pair_gap", "cluster_gap", "row_gap", "top")
+MARGIN = 20 # px kept free around the grid when it is scaled to the screen
+MAX_SCALE = 1.0 # small rooms keep their designed size instead of being blown up
+
+Box = tuple[float, float, float, float] # x1, y1, x2, y2
+
+
+class LayoutError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Zone:
+    # Rows of clusters of seats; a seat is a workstation name, DOOR, or None for an empty spot
+    name: str
+    rows: tuple[tuple[tuple[str | None, ...], ...], ...]
+    box_size: int = 60
+    pair_gap: int = 20
+    cluster_gap: int = 50
+    row_gap: int = 50
+    top: int = 150 # px above the grid for the title, unscaled
+
+    @property
+    def names(self) -> list[str]:
+        return [name for row in self.rows for cluster in row for name in cluster if name not in (None, DOOR)]
+
+
+@dataclass(frozen=True)
+class Layout:
+    zones: tuple[Zone, ...]
+
+    @property
+    def names(self) -> list[str]:
+        return [name for zone in self.zones for name in zone.names]
+
+    def mismatch(self, workstation_names: set[str]) -> tuple[list[str], list[str]]:
+        # (in the layout but not the API, in the API but not the layout)
+        names = set(self.names)
+        return (sorted(names - workstation_names, key=natural_key),
+                sorted(workstation_names - names, key=natural_key))
+
+    def problems(self, workstation_names: set[str]) -> list[str]:
+        missing, unplaced = self.mismatch(workstation_names)
+        problems = []
+        if missing:
+            problems.append(f"not in the API, drawn as missing: {', '.join(missing)}")
+        if unplaced:
+            problems.append(f"not in the layout, cannot be chosen: {', '.join(unplaced)}")
+        return problems
+
+
+@dataclass(frozen=True)
+class Geometry:
+    # Everything the room map draws for a zone, computed once per canvas size
+    boxes: dict[str, Box]
+    doors: tuple[Box, ...]
+    captions_y: float
+    row_tops: tuple[float, ...]
+    row_lefts: tuple[tuple[float, ...], ...] # x of every seat in a row
+    cells: dict[tuple[int, int], str] # (row, seat) -> workstation name
+    box_size: float
+    scale: float
+
+    def hit(self, x: float, y: float) -> str | None:
+        row = bisect.bisect_right(self.row_tops, y) - 1
+        if row < 0 or y > self.row_tops[row] + self.box_size:
+            return None
+        lefts = self.row_lefts[row]
+        seat = bisect.bisect_right(lefts, x) - 1
+        if seat < 0 or x > lefts[seat] + self.box_size:
+            return None
+        return self.cells.get((row, seat))
+
+    def font_size(self, size: int) -> int:
+        return max(7, round(size * self.scale))
+
+
+class FreeSeatIndex:
+    # Free seats per workstation type, kept sorted by how far they are from the entrance, so the nearest one is
+    # the head of a list. Updates only touch seats whose state changed.
+    def __init__(self, layout: Layout):
+        self.ranks = seat_ranks(layout)
+        self.free: dict[WorkstationType, list[tuple[tuple[int, float], str]]] = {kind: [] for kind in WorkstationType}
+        self.state: dict[str, tuple[WorkstationType, bool]] = {} # name -> (type, free)
+
+    def update(self, workstations: list[Workstation]):
+        seen = set()
+        for ws in workstations:
+            name = str(ws.name)
+            if name not in self.ranks:
+                continue
+            seen.add(name)
+            state = (ws.type, not ws.occupied)
+            if self.state.get(name) != state:
+                self._set(name, state)
+        for name in self.state.keys() - seen:
+            self._set(name, None)
+
+    def _set(self, name: str, state: tuple[WorkstationType, bool] | None):
+        entry = (self.ranks[name], name)
+        old = self.state.pop(name, None)
+        if old is not None and old[1]:
+            free = self.free[old[0]]
+            del free[bisect.bisect_left(free, entry)]
+        if state is not None:
+            self.state[name] = state
+            if state[1]:
+                bisect.insort(self.free[state[0]], entry)
+
+    def nearest(self, kind: WorkstationType) -> str | None:
+        free = self.free[kind]
+        return free[0][1] if free else None
+
+    def count(self, kind: WorkstationType) -> int:
+        return len(self.free[kind])
+
+
+def load_layout(path: str) -> Layout:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as err:
+        raise LayoutError(f"Cannot read room layout {path}: {err}") from err
+    return parse_layout(data, path)
+
+
+def parse_layout(data: dict, path: str = "layout") -> Layout:
+    # Either a single room with its rows at the top level, or a list of zones shown as tabs
+    if not isinstance(data, dict):
+        raise LayoutError(f"{path}: expected an object")
+    if "zones" not in data:
+        return Layout((parse_zone(data, {}, "", path),))
+    if not isinstance(data["zones"], list) or not data["zones"]:
+        raise LayoutError(f"{path}: zones must be a non-empty list")
+
+    defaults = parse_spacings(data, path)
+    zones = tuple(parse_zone(zone, defaults, str(zone.get("name", i + 1)) if isinstance(zone, dict) else "",
+                             f"{path} zone {i}")
+                  for i, zone in enumerate(data["zones"]))
+    seen = set()
+    for zone in zones:
+        for name in zone.names:
+            if name in seen:
+                raise LayoutError(f"{path}: workstation {name} appears in more than one zone")
+            seen.add(name)
+    return Layout(zones)
+
+
+def parse_spacings(data: dict, path: str) -> dict:
+    spacings = {}
+    for name in SPACINGS:
+        if name in data:
+            if not isinstance(data[name], int) or data[name] < 0:
+                raise LayoutError(f"{path}: {name} must be a non-negative integer")
+            spacings[name] = data[name]
+    if spacings.get("box_size", 1) == 0:
+        raise LayoutError(f"{path}: box_size must be positive")
+    return spacings
+
+
+def parse_zone(data: dict, defaults: dict, name: str, path: str) -> Zone:
+    if not isinstance(data, dict) or not isinstance(data.get("rows"), list) or not data["rows"]:
+        raise LayoutError(f"{path}: expected an object with a non-empty list of rows")
+    spacings = {**defaults, **parse_spacings(data, path)}
+
+    rows = []
+    seen = set()
+    for r, row in enumerate(data["rows"]):
+        if not isinstance(row, list):
+            raise LayoutError(f"{path}: row {r} must be a list of clusters")
+        clusters = []
+        for c, cluster in enumerate(row):
+            if not isinstance(cluster, list) or not cluster:
+                raise LayoutError(f"{path}: row {r} cluster {c} must be a non-empty list of seats")
+            for seat in cluster:
+                if seat is not None and (not isinstance(seat, str) or not seat):
+                    raise LayoutError(f"{path}: row {r} cluster {c} has a seat that is not a name or null: {seat!r}")
+                if seat not in (None, DOOR):
+                    if seat in seen:
+                        raise LayoutError(f"{path}: workstation {seat} appears twice")
+                    seen.add(seat)
+            clusters.append(tuple(cluster))
+        rows.append(tuple(clusters))
+    return Zone(name, tuple(rows), **spacings)
+
+
+def natural_size(zone: Zone) -> tuple[float, float]:
+    # Grid plus the caption row below it, at scale 1 and without the title area
+    def row_width(row) -> float:
+        seats = sum(len(cluster) for cluster in row)
+        return seats * zone.box_size + sum(len(cluster) - 1 for cluster in row) * zone.pair_gap \
+            + max(len(row) - 1, 0) * zone.cluster_gap
+
+    width = max(row_width(row) for row in zone.rows)
+    height = len(zone.rows) * (zone.box_size + zone.row_gap) + 2 * zone.box_size + 40
+    return width, height
+
+
+@lru_cache(maxsize=16)
+def compile_layout(zone: Zone, width: int | None = None, height: int | None = None) -> Geometry:
+    # Without a canvas size the zone is laid out at its designed scale from x=0
+    natural_width, natural_height = natural_size(zone)
+    if width is None or height is None:
+        scale, x_start = 1.0, 0.0
+    else:
+        scale = min(MAX_SCALE, (width - 2 * MARGIN) / natural_width, (height - zone.top - MARGIN) / natural_height)
+        scale = max(scale, 0.1)
+        x_start = (width - natural_width * scale) / 2
+    box = zone.box_size * scale
+
+    boxes, doors, cells = {}, [], {}
+    row_tops, row_lefts = [], []
+    y = zone.top
+    for r, row in enumerate(zone.rows):
+        lefts = []
+        x = x_start
+        for cluster in row:
+            for i, name in enumerate(cluster):
+                if i:
+                    x += box + zone.pair_gap * scale
+                lefts.append(x)
+                if name == DOOR:
+                    doors.append((x, y, x + box, y + box))
+                elif name is not None:
+                    boxes[name] = (x, y, x + box, y + box)
+                    cells[(r, len(lefts) - 1)] = name
+            x += box + zone.cluster_gap * scale
+        row_tops.append(y)
+        row_lefts.append(tuple(lefts))
+        y += box + zone.row_gap * scale
+    return Geometry(boxes, tuple(doors), y + box, tuple(row_tops), tuple(row_lefts), cells, box, scale)
+
+
+@lru_cache(maxsize=4)
+def seat_ranks(layout: Layout) -> dict[str, tuple[int, float]]:
+    # (zone, walking distance from the zone's door) per seat; zones are listed from the entrance inwards
+    ranks = {}
+    for z, zone in enumerate(layout.zones):
+        geometry = compile_layout(zone)
+        door = geometry.doors[0] if geometry.doors else (0, zone.top, 0, zone.top)
+        door_x, door_y = (door[0] + door[2]) / 2, (door[1] + door[3]) / 2
+        for name, (x1, y1, x2, y2) in geometry.boxes.items():
+            ranks[name] = (z, abs((x1 + x2) / 2 - door_x) + abs((y1 + y2) / 2 - door_y))
+    return ranks
+
+
+def natural_key(name: str) -> tuple:
+    return (0, int(name), "") if name.isdigit() else (1, 0, name)
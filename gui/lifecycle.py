@@ -0,0 +1,46 @@
+import tkinter as tk
+from typing import Callable
+
+
+class CanvasScope:
+    # Canvas items created under one tag, together with the callbacks bound to them. tkinter registers a Tcl command
+    # for every bound callback and only deletes it on an explicit unbind, so deleting the items alone would leak the
+    # command and the closure it holds.
+    def __init__(self, canvas: tk.Canvas, tag: str):
+        self.canvas = canvas
+        self.tag = tag
+        self.bindings: list[tuple[str | int, str, str]] = [] # (tag or item id, sequence, Tcl command)
+
+    def bind(self, tag_or_id: str | int, sequence: str, func: Callable):
+        self.bindings.append((tag_or_id, sequence, self.canvas.tag_bind(tag_or_id, sequence, func)))
+
+    def clear(self):
+        for tag_or_id, sequence, command in self.bindings:
+            self.canvas.tag_unbind(tag_or_id, sequence, command)
+        self.bindings.clear()
+        self.canvas.delete(self.tag)
+
+
+class Timers:
+    # Named after() callbacks: scheduling a name again replaces the pending callback instead of adding another
+    def __init__(self, widget: tk.Misc):
+        self.widget = widget
+        self.pending: dict[str, str] = {}
+
+    def schedule(self, name: str, ms: int, func: Callable[[], None]):
+        self.cancel(name)
+
+        def fire():
+            self.pending.pop(name, None)
+            func()
+
+        self.pending[name] = self.widget.after(ms, fire)
+
+    def cancel(self, name: str):
+        after_id = self.pending.pop(name, None)
+        if after_id is not None:
+            self.widget.after_cancel(after_id)
+
+    def cancel_all(self):
+        for name in list(self.pending):
+            self.cancel(name)
@@ -1,30 +1,160 @@
 import logging
 import queue
-from tkinter import Canvas
+import time
+from tkinter import Canvas, font
 
+from diagnostics.metrics import ROOM_LAYOUT_MISSING, ROOM_LAYOUT_UNPLACED
+from gui.layout import FreeSeatIndex, Geometry, Layout, compile_layout
+from gui.lifecycle import CanvasScope
 from obj.objects import Workstation, WorkstationType, Message, MessageType
 
-BOX_SIZE = 60
-GRID = [
-    [('30', '28'), ('26', '24'), ('22', '20'), ('18', '16'), ('14', '12'), ('10', '7')],
-    [('29', '27'), ('25', '23'), ('21', '19'), ('17', '15'), ('13', '11'), ('9', '6')],
-    [('0', '0'), ('0', '0'), ('0', '0'), ('0', '0'), ('0', '0'), ('8', '5')],
-    [('0', '0'), ('0', '0'), ('0', '0'), ('0', '0'), ('0', '0'), ('0', '0')],
-    [('31', '33'), ('35', '37'), ('0', '0'), ('0', '0'), ('0', '0'), ('4', '2')],
-    [('32', '34'), ('36', '38'), ('0', '0'), ('0', '0'), ('D', 'D'), ('3', '1')]
-]
+TAG = "room_map"
+ZONE_TAG = "room_map_zone"
+SEAT_TAG = "room_map_seat"
+MISSING_COLOR = "#D3D3D3"
+SUGGESTED_OUTLINE = "#1565C0"
+STALE_COLOR = "#E65100"
 
 class RoomMap:
-    def __init__(self, logger: logging.Logger, events: queue.Queue, canvas: Canvas):
+    def __init__(self, logger: logging.Logger, events: queue.Queue, canvas: Canvas, layout: Layout,
+                 reader_id: str | None = None, tabs_left: int = 20):
         self.logger = logger
         self.events = events
         self.canvas = canvas
+        self.layout = layout
+        self.reader_id = reader_id
+        self.tabs_left = tabs_left # x where the zone tabs start, clear of anything drawn in the top left corner
+        self.known_names: set[str] | None = None
+        self.free_seats = FreeSeatIndex(layout)
 
-    def draw(self, workstations: list[Workstation], student_id: str):
+        # Canvas items are created once per canvas size and then only reconfigured. Only the zone on screen has
+        # items for its seats, so the item count follows the zone and not the whole layout.
+        self.size: tuple[int, int] | None = None
+        self.scope = CanvasScope(canvas, TAG)
+        self.zone_scope = CanvasScope(canvas, ZONE_TAG)
+        self.zone = 0
+        self.built_zone: int | None = None
+        self.geometry: Geometry | None = None
+        self.rects: dict[str, int] = {}
+        self.fills: dict[str, str] = {}
+        self.outlined: set[str] = set()
+        self.tabs: list[int] = []
+        self.tab_fonts: tuple[font.Font, font.Font] | None = None # inactive, active
+        self.suggestions: dict[WorkstationType, int] = {}
+        self.student_text: int | None = None
+        self.stale_text: int | None = None
+
+        self.workstations: list[Workstation] | None = None
+        self.stations: dict[str, Workstation] = {}
+        self.student_id: str | None = None
+        self.visible = False
+
+    def draw(self, workstations: list[Workstation], student_id: str, stale_for: float | None = None):
         self.canvas.config(cursor="")
-        stations = {str(ws.name): ws for ws in workstations}
 
-        self.canvas.delete("temp")
+        self._build()
+        self.student_id = student_id
+        self.canvas.itemconfig(self.student_text, text="Student: " + student_id)
+        self.update(workstations)
+        self.mark_stale(stale_for)
+        self.show_zone(self.suggested_zone())
+
+        self.canvas.itemconfig(TAG, state="normal")
+        self.visible = True
+
+    def hide(self):
+        if self.visible:
+            self.canvas.itemconfig(TAG, state="hidden")
+            self.visible = False
+            self.student_id = None
+
+    def validate(self, workstations: list[Workstation] | None):
+        # Logged once per change in the API's workstation names, not on every poll. The gauges let a fleet dashboard
+        # spot a kiosk whose layout has drifted from the API without reading its log.
+        if workstations is None:
+            return
+        names = {str(ws.name) for ws in workstations}
+        if names == self.known_names:
+            return
+        self.known_names = names
+        missing, unplaced = self.layout.mismatch(names)
+        ROOM_LAYOUT_MISSING.set_function(lambda: len(missing))
+        ROOM_LAYOUT_UNPLACED.set_function(lambda: len(unplaced))
+        for problem in self.layout.problems(names):
+            self.logger.warning(f"Room layout does not match the API, workstations {problem}")
+
+    def mark_stale(self, stale_for: float | None):
+        # A clock time rather than an age, so the marker stays right while the map is open
+        label = ""
+        if stale_for == float("inf"):
+            label = "Seat availability unknown"
+        elif stale_for is not None:
+            label = f"Seats as of {time.strftime('%H:%M:%S', time.localtime(time.time() - stale_for))}, may have changed"
+        self.canvas.itemconfig(self.stale_text, text=label)
+
+    def update(self, workstations: list[Workstation]):
+        if workstations is None or workstations is self.workstations:
+            return
+        self.workstations = workstations
+        self.stations = {str(ws.name): ws for ws in workstations}
+        self.free_seats.update(workstations)
+        self._refresh()
+
+    def show_zone(self, index: int):
+        if index != self.zone or self.built_zone is None:
+            self.zone = index
+            self._build_zone()
+            self._refresh()
+            if self.visible:
+                self.canvas.itemconfig(ZONE_TAG, state="normal")
+        for i, tab in enumerate(self.tabs):
+            active = i == self.zone
+            self.canvas.itemconfig(tab, fill="black" if active else "gray", font=self.tab_fonts[active])
+
+    def suggested_zone(self) -> int:
+        # Open on the zone of the nearest free seat, which is where a student would most likely sit
+        nearest = [name for name in map(self.free_seats.nearest, WorkstationType) if name is not None]
+        if not nearest:
+            return self.zone
+        return min(self.free_seats.ranks[name] for name in nearest)[0]
+
+    def _refresh(self):
+        for name, rect in self.rects.items():
+            ws = self.stations.get(name)
+            fill = fill_color(ws) if ws is not None else MISSING_COLOR
+            if self.fills.get(name) != fill:
+                self.canvas.itemconfig(rect, fill=fill)
+                self.fills[name] = fill
+
+        suggested = set()
+        for kind, text in self.suggestions.items():
+            name = self.free_seats.nearest(kind)
+            if name is not None:
+                suggested.add(name)
+            label = f"Nearest free {kind.value.lower()}: {name}" if name is not None else ""
+            self.canvas.itemconfig(text, text=label)
+        for name in self.outlined - suggested:
+            if name in self.rects:
+                self.canvas.itemconfig(self.rects[name], outline="black", width=1)
+        for name in suggested - self.outlined:
+            if name in self.rects:
+                self.canvas.itemconfig(self.rects[name], outline=SUGGESTED_OUTLINE, width=3)
+        self.outlined = suggested & self.rects.keys()
+
+    def _build(self):
+        size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        if size == self.size:
+            return
+        self.zone_scope.clear()
+        self.scope.clear()
+        self.rects.clear()
+        self.fills.clear()
+        self.outlined.clear()
+        self.tabs.clear()
+        self.suggestions.clear()
+        self.workstations = None
+        self.built_zone = None
+        self.size = size
 
         self.canvas.create_text(
             self.canvas.winfo_width() // 2,
@@ -32,17 +162,55 @@ class RoomMap:
             text="Choose a seat",
             font=("Arial", 28),
             fill="black",
-            tags=("temp",)
+            state="hidden",
+            tags=(TAG,)
         )
-        self.canvas.create_text(
+        self.student_text = self.canvas.create_text(
             self.canvas.winfo_width() // 2,
             75,
-            text="Student: " + student_id,
+            text="",
             font=("Arial", 20),
             fill="gray",
-            tags=("temp",)
+            state="hidden",
+            tags=(TAG,)
+        )
+
+        self.stale_text = self.canvas.create_text(
+            self.canvas.winfo_width() // 2,
+            137,
+            text="",
+            font=("Arial", 14),
+            fill=STALE_COLOR,
+            state="hidden",
+            tags=(TAG,)
         )
-        self._draw_workstations(stations, student_id)
+
+        # Tapping a suggestion reserves that seat without looking for it on the map
+        for kind, x, anchor in ((WorkstationType.LAPTOP, self.canvas.winfo_width() // 2 - 20, "e"),
+                                (WorkstationType.DESKTOP, self.canvas.winfo_width() // 2 + 20, "w")):
+            self.suggestions[kind] = self.canvas.create_text(
+                x,
+                112,
+                text="",
+                font=("Arial", 16),
+                fill=SUGGESTED_OUTLINE,
+                anchor=anchor,
+                state="hidden",
+                tags=(TAG, "click")
+            )
+            self.scope.bind(self.suggestions[kind], "<Button>",
+                            lambda event, kind=kind: self._on_ws_click(self.free_seats.nearest(kind)))
+
+        if len(self.layout.zones) > 1:
+            x = self.tabs_left
+            self.tab_fonts = (font.Font(family="Arial", size=16), font.Font(family="Arial", size=16, weight="bold"))
+            for i, zone in enumerate(self.layout.zones):
+                tab = self.canvas.create_text(x, 20, text=zone.name, font=self.tab_fonts[0], fill="gray", anchor="nw",
+                                              state="hidden", tags=(TAG, "click"))
+                self.scope.bind(tab, "<Button>", lambda event, i=i: self.show_zone(i))
+                self.tabs.append(tab)
+                # Spaced for the bold font, the widest a tab is ever drawn in
+                x += self.tab_fonts[1].measure(zone.name) + 30
 
         cancel = self.canvas.create_text(
             self.canvas.winfo_width() - 20,
@@ -51,111 +219,86 @@ class RoomMap:
             font=("Arial", 20),
             fill="gray",
             anchor="ne",
-            tags=("temp", "click")
+            state="hidden",
+            tags=(TAG, "click")
         )
-        self.canvas.tag_bind(cancel, "<Button>", lambda event: self.events.put(Message(MessageType.CANCEL_SEAT_SELECTION)))
-
-    def _draw_workstations(self, stations: dict[str, Workstation], student_id: str):
-        cluster_width = BOX_SIZE + 20 + BOX_SIZE
-        total_spacing = 50 * (len(GRID[0]) - 1)
-        total_width = cluster_width * len(GRID[0]) + total_spacing
-        x_start = (self.canvas.winfo_width() - total_width) / 2
-
-        x = x_start
-        y = 150
-
-        for row in GRID:
-            for left, right in row:
-                if left == 'D':
-                    self.canvas.create_line(x, y + BOX_SIZE, x + BOX_SIZE, y + BOX_SIZE, tags=("temp",))
-                elif left != '0':
-                    ws_left = stations[left]
-                    self._draw_workstation(ws_left, x, y, student_id)
+        self.scope.bind(cancel, "<Button>", lambda event: self.events.put(Message(MessageType.CANCEL_SEAT_SELECTION,
+                                                                                     reader_id=self.reader_id)))
+        # One binding for every seat, the geometry table tells which one was hit
+        self.scope.bind(SEAT_TAG, "<Button>", self._on_click)
 
-                x = x + BOX_SIZE + 20
+    def _build_zone(self):
+        self.zone_scope.clear()
+        self.rects.clear()
+        self.fills.clear()
+        self.outlined.clear()
+        self.built_zone = self.zone
+        self.geometry = compile_layout(self.layout.zones[self.zone], *self.size)
 
-                if right == 'D':
-                    self.canvas.create_line(x, y + BOX_SIZE, x + BOX_SIZE, y + BOX_SIZE, tags=("temp",))
-                elif right != '0':
-                    ws_right = stations[right]
-                    self._draw_workstation(ws_right, x, y, student_id)
+        for name, (x, y, _, _) in self.geometry.boxes.items():
+            self.rects[name] = self._build_workstation(name, MISSING_COLOR, x, y, True)
+        for x1, _, x2, y2 in self.geometry.doors:
+            self.canvas.create_line(x1, y2, x2, y2, state="hidden", tags=(TAG, ZONE_TAG))
 
-                x = x + BOX_SIZE + 50
-            x = x_start
-            y = y + BOX_SIZE + 50
+        self._build_captions()
 
-        self._draw_captions(y)
-
-        return x, y
-
-    def _draw_captions(self, y_start: int):
-        # Draw captions
-        y_cap = y_start + BOX_SIZE
-        x_cap_1 = int(self.canvas.winfo_width() / 2 - BOX_SIZE * 1.5)
+    def _build_captions(self):
+        box_size = self.geometry.box_size
+        y_cap = self.geometry.captions_y
+        x_cap_1 = int(self.canvas.winfo_width() / 2 - box_size * 1.5)
         x_cap_2 = int(self.canvas.winfo_width() / 2)
-        x_cap_3 = int(self.canvas.winfo_width() / 2 + BOX_SIZE * 1.5)
-
-        # Caption Laptop
-        self._draw_workstation(Workstation(-1, "LTI-PC", WorkstationType.DESKTOP, False),
-                               x_cap_1, y_cap, None)
-        self.canvas.create_text(
-            x_cap_1 + BOX_SIZE / 2,
-            y_cap + BOX_SIZE + 20,
-            text="Laptop",
-            font=("Arial", 13),
-            anchor="center",
-            tags=("temp",)
-        )
+        x_cap_3 = int(self.canvas.winfo_width() / 2 + box_size * 1.5)
 
-        # Caption Desktop
-        self._draw_workstation(Workstation(-1, "LTI-PC", WorkstationType.LAPTOP, False),
-                               x_cap_2, y_cap, None)
-        self.canvas.create_text(
-            x_cap_2 + BOX_SIZE / 2,
-            y_cap + BOX_SIZE + 20,
-            text="Desktop",
-            font=("Arial", 13),
-            anchor="center",
-            tags=("temp",)
-        )
-
-        # Caption Occupied
-        self._draw_workstation(Workstation(-1, "LTI-PC", WorkstationType.DESKTOP, True),
-                               x_cap_3, y_cap, None)
-        self.canvas.create_text(
-            x_cap_3 + BOX_SIZE / 2,
-            y_cap + BOX_SIZE + 20,
-            text="Occupied",
-            font=("Arial", 13),
-            anchor="center",
-            tags=("temp",)
-        )
-        return x_cap_1, y_cap
+        captions = [
+            (Workstation(-1, "LTI-PC", WorkstationType.DESKTOP, False), x_cap_1, "Laptop"),
+            (Workstation(-1, "LTI-PC", WorkstationType.LAPTOP, False), x_cap_2, "Desktop"),
+            (Workstation(-1, "LTI-PC", WorkstationType.DESKTOP, True), x_cap_3, "Occupied"),
+        ]
+        for ws, x_cap, caption in captions:
+            self._build_workstation(ws.name, fill_color(ws), x_cap, y_cap, False)
+            self.canvas.create_text(
+                x_cap + box_size / 2,
+                y_cap + box_size + 20 * self.geometry.scale,
+                text=caption,
+                font=("Arial", self.geometry.font_size(13)),
+                anchor="center",
+                state="hidden",
+                tags=(TAG, ZONE_TAG)
+            )
 
-    def _draw_workstation(self, ws: Workstation, x: int, y: int, student_id: str | None):
-        x2 = x + BOX_SIZE
-        y2 = y + BOX_SIZE
+    def _build_workstation(self, name: str, fill: str, x: float, y: float, clickable: bool) -> int:
+        x2 = x + self.geometry.box_size
+        y2 = y + self.geometry.box_size
 
-        if ws.occupied:
-            fill_color = "#F7825B"
-        elif ws.type == WorkstationType.DESKTOP:
-            fill_color = "#A0E89C"
-        elif ws.type == WorkstationType.LAPTOP:
-            fill_color = "#5ABC9D"
-        else:
-            fill_color = "#D3D3D3"
-
-        tag = f"ws_{ws.name}"
-        tag_click = "click" if student_id is not None else ""
+        tags = (TAG, ZONE_TAG, "click", SEAT_TAG) if clickable else (TAG, ZONE_TAG)
 
-        self.canvas.create_rectangle(x, y, x2, y2, fill=fill_color, outline="black", tags=("temp", tag_click, tag,))
-        self.canvas.create_text((x + x2) / 2, (y + y2) / 2, text=str(ws.name), font=("Arial", 12), tags=("temp", tag_click, tag,))
+        rect = self.canvas.create_rectangle(x, y, x2, y2, fill=fill, outline="black", state="hidden", tags=tags)
+        self.canvas.create_text((x + x2) / 2, (y + y2) / 2, text=name, font=("Arial", self.geometry.font_size(12)),
+                                state="hidden", tags=tags)
+        return rect
 
-        if student_id is not None: self.canvas.tag_bind(tag, "<Button>", lambda event: self._on_ws_click(ws, student_id))
+    def _on_click(self, event):
+        name = self.geometry.hit(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        if name is not None:
+            self._on_ws_click(name)
 
-    def _on_ws_click(self, ws: Workstation, student_id: str):
-        self.logger.debug("The Workstation " + ws.name + " was clicked.")
+    def _on_ws_click(self, name: str | None):
+        ws = self.stations.get(name)
+        if ws is None or self.student_id is None:
+            return
+        self.logger.debug("The Workstation %s was clicked.", ws.name)
         if ws.occupied:
             return
 
-        self.events.put(Message(MessageType.WORKSTATION_CLICKED, {"ws_id": ws.id, "ws_name": ws.name, "student_id": student_id}))
+        self.events.put(Message(MessageType.WORKSTATION_CLICKED, {"ws_id": ws.id, "ws_name": ws.name, "student_id": self.student_id},
+                                reader_id=self.reader_id))
+
+
+def fill_color(ws: Workstation) -> str:
+    if ws.occupied:
+        return "#F7825B"
+    elif ws.type == WorkstationType.DESKTOP:
+        return "#A0E89C"
+    elif ws.type == WorkstationType.LAPTOP:
+        return "#5ABC9D"
+    return MISSING_COLOR
@@ -0,0 +1,183 @@
+import logging
+import time
+from tkinter import Canvas
+
+from diagnostics.metrics import SCREEN_PAINT_SECONDS
+from gui.assets import LazyAsset
+
+TAG = "screen"
+
+WAITING = "waiting"
+LOADING = "loading"
+ERROR = "error"
+STUDENT_NOT_FOUND = "student_not_found"
+RENEWAL_REQUIRED = "renewal_required"
+CARD_ASSIGNING = "card_assigning"
+SERVICE_UNAVAILABLE = "service_unavailable"
+SEAT_RESERVED = "seat_reserved"
+ENTRY_CLOSED = "entry_closed"
+
+TITLE_SUBTITLE = {
+    STUDENT_NOT_FOUND: ("Student not found", "Please register your student card via LEMAC's website"),
+    RENEWAL_REQUIRED: ("Renewal Required", "Please renew your student registration via LEMAC's website"),
+    CARD_ASSIGNING: ("Card Scanned", "After monitor's confirmation you can immediately start using your card"),
+    SERVICE_UNAVAILABLE: ("Service Unavailable", "Please try again in a moment"),
+    SEAT_RESERVED: ("", "Please scan card on exit"),
+    ENTRY_CLOSED: ("Entry Closed", "Thank you for your visit"),
+}
+CENTER_TEXT = {
+    WAITING: "Waiting for card...",
+    LOADING: "Processing card...",
+    ERROR: "",
+}
+
+CENTER_FONT = ("Arial", 32)
+SUBTITLE_FONT = ("Arial", 22)
+CAPTION_FONT = ("Arial", 13)
+
+
+class FrameTimer:
+    # Time from a screen switch until Tk has redrawn the canvas, per screen
+    def __init__(self, logger: logging.Logger, canvas: Canvas):
+        self.logger = logger
+        self.canvas = canvas
+        self.stats: dict[str, list[float]] = {} # name -> [count, total_ms, max_ms]
+
+    def measure(self, name: str, start: float):
+        # Idle callbacks run in order, so this one fires after the redraw queued by the switch
+        self.canvas.after_idle(lambda: self._record(name, start))
+
+    def _record(self, name: str, start: float):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        SCREEN_PAINT_SECONDS.observe(elapsed_ms / 1000, name)
+        stats = self.stats.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed_ms
+        stats[2] = max(stats[2], elapsed_ms)
+        self.logger.debug("Switched to %s in %.1fms", name, elapsed_ms)
+
+    def report(self) -> list[str]:
+        return [f"{name}: {int(count)} frames avg={total / count:.1f}ms max={peak:.1f}ms"
+                for name, (count, total, peak) in sorted(self.stats.items())]
+
+
+class Screens:
+    def __init__(self, canvas: Canvas, qrcode: LazyAsset, arrow: LazyAsset):
+        self.canvas = canvas
+        self.qrcode = qrcode
+        self.arrow = arrow
+
+        # Every screen is created once per canvas size, hidden, and then only toggled
+        self.size: tuple[int, int] | None = None
+        self.texts: dict[str, int] = {}
+        self.dynamic: dict[str, str] = {} # screen -> text currently set on its dynamic item
+        self.current: str | None = None
+
+    def show(self, name: str, text: str | None = None):
+        self._build()
+        if name != self.current:
+            if self.current is not None:
+                self.canvas.itemconfig(screen_tag(self.current), state="hidden")
+            self.canvas.itemconfig(screen_tag(name), state="normal")
+            self.current = name
+        if text is not None and self.dynamic.get(name) != text:
+            self.canvas.itemconfig(self.texts[name], text=text)
+            self.dynamic[name] = text
+
+    def hide(self):
+        if self.current is not None:
+            self.canvas.itemconfig(screen_tag(self.current), state="hidden")
+            self.current = None
+
+    def refresh(self):
+        # Rebuild the visible screen when the canvas size changed, e.g. once the window is mapped
+        if self.current is not None and self._size() != self.size:
+            self.show(self.current, self.dynamic.get(self.current))
+
+    def _size(self) -> tuple[int, int]:
+        return self.canvas.winfo_width(), self.canvas.winfo_height()
+
+    def _build(self):
+        size = self._size()
+        if size == self.size:
+            return
+        self.canvas.delete(TAG)
+        self.texts.clear()
+        self.dynamic.clear()
+        self.current = None
+        self.size = size
+
+        for name, text in CENTER_TEXT.items():
+            self.texts[name] = self._center_text(name, text)
+        for name, (title, subtitle) in TITLE_SUBTITLE.items():
+            self.texts[name] = self._title_subtitle(name, title, subtitle)
+        self._build_registration()
+
+    def _build_registration(self):
+        width = self.size[0]
+        tags = (TAG, screen_tag(WAITING))
+        self.canvas.create_text(
+            width - 20 - self.qrcode.width() - self.arrow.width(),
+            10 + self.qrcode.height() // 2,
+            text="Student\nRegistration",
+            font=CAPTION_FONT,
+            fill="gray",
+            justify="center",
+            anchor="e",
+            state="hidden",
+            tags=tags
+        )
+        self.canvas.create_image(
+            width - 10 - self.qrcode.width(),
+            10 + self.qrcode.height() // 2,
+            image=self.arrow.image,
+            anchor="e",
+            state="hidden",
+            tags=tags
+        )
+        self.canvas.create_image(
+            width - 10,
+            10,
+            image=self.qrcode.image,
+            anchor="ne",
+            state="hidden",
+            tags=tags
+        )
+
+    def _center_text(self, name: str, text: str) -> int:
+        return self.canvas.create_text(
+            self.size[0] // 2,
+            self.size[1] // 2,
+            text=text,
+            font=CENTER_FONT,
+            fill="gray",
+            state="hidden",
+            tags=(TAG, screen_tag(name))
+        )
+
+    def _title_subtitle(self, name: str, title: str, subtitle: str) -> int:
+        title_text = self.canvas.create_text(
+            self.size[0] // 2,
+            self.size[1] // 2,
+            text=title,
+            font=CENTER_FONT,
+            fill="gray",
+            anchor="s",
+            state="hidden",
+            tags=(TAG, screen_tag(name))
+        )
+        self.canvas.create_text(
+            self.size[0] // 2,
+            self.size[1] // 2 + 5,
+            text=subtitle,
+            font=SUBTITLE_FONT,
+            fill="gray",
+            anchor="n",
+            state="hidden",
+            tags=(TAG, screen_tag(name))
+        )
+        return title_text
+
+
+def screen_tag(name: str) -> str:
+    return f"screen_{name}"
@@ -1,132 +1,453 @@
+from diagnostics.startup import StartupProfile # First, so the profile includes every other import
+
+import atexit
 import logging
 import queue
 import sys
 import threading
+import time
 import tkinter as tk
-from logging.handlers import RotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
-from api_clients.ApiWorker import ApiWorker, ApiJobType, ApiJob
-from api_clients.workstations import WorkstationPoller
-from config import VERSION, LOG_FILE
-from pi.card_reader import CardScanner
+from api_clients.jobs import ApiJobQueue, ApiJobType, ApiJob
+from config import (VERSION, LOG_FILE, LOG_FORMAT, JOURNAL_FILE, API_WORKERS, METRICS_PORT, METRICS_TEXTFILE, READERS,
+                    CARD_READER, CARD_READER_IRQ_PIN, CARD_READER_SOURCE, CARD_REPLAY_SPEED, WORKSTATION_STREAM,
+                    RESULT_DWELL_MS, ERROR_DWELL_MS, SEAT_CHOICE_TIMEOUT_MS, WORKSTATION_FRESH_SECONDS,
+                    WORKSTATION_REFRESH_WAIT_MS, PROFILE_DIR, PROFILE_SOCKET, PROFILE_SECONDS)
+from diagnostics import logs, metrics, profiler
 from gui.gui import AppGui
-from obj.objects import Workstation, Message, MessageType
+from gui.lifecycle import Timers
+from obj.event_queue import WakeupQueue
+from obj.objects import Workstation, Message, MessageType, ReaderConfig, KioskState
 import pi.sounds as sounds
 
+FETCH_DEADLINE = 10 # seconds a card lookup may take before its answer is no longer shown
+STARTUP_REPORT_TIMEOUT = 15000 # ms to wait for the first poll before printing the startup profile anyway
+STARTUP_MILESTONES = {"first screen drawn", "first workstation update"}
+HEARTBEAT_MS = 500 # ms between beats of the Tk loop, the watchdog reports it after a second more without one
+# Answers to a card lookup, timed from the scan until they are on screen
+SCAN_ANSWERS = {
+    MessageType.API_STUDENT_NOT_FOUND,
+    MessageType.API_STUDENT_REQUIRES_RENEWAL,
+    MessageType.API_CARD_ASSIGNING,
+    MessageType.API_NO_ACTIVE_ENTRY,
+    MessageType.API_ACTIVE_ENTRY_FOUND,
+    MessageType.API_UNAVAILABLE,
+    MessageType.API_ERROR,
+}
+READING_STATES = {KioskState.WAITING, KioskState.SHOWING_RESULT}
+BUSY_STATES = {KioskState.LOOKUP, KioskState.CHOOSING_SEAT}
+# Untagged messages of these types go to every reader, any other untagged message to the first one
+BROADCAST = {MessageType.RESET, MessageType.API_WORKSTATION_UPDATE}
+STREAM_READERS = {"socket", "fifo", "stdin"}
+SPI_READERS = {"auto", "irq", "polling"}
+
+
+def reader_configs() -> list[ReaderConfig]:
+    defaults = ReaderConfig("main", CARD_READER, irq_pin=CARD_READER_IRQ_PIN, source=CARD_READER_SOURCE)
+    readers = [ReaderConfig.from_dict(reader, defaults) for reader in READERS] or [defaults]
+    ids = [reader.id for reader in readers]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Reader ids must be unique, got {ids}")
+    # Two readers on one socket, FIFO, stdin or SPI device would steal each other's cards
+    sources = [(reader.card_reader, reader.source) for reader in readers if reader.card_reader in STREAM_READERS]
+    if len(set(sources)) != len(sources):
+        raise ValueError(f"Reader sources must be unique, got {sources}")
+    devices = [(reader.spi_bus, reader.spi_device) for reader in readers if reader.card_reader in SPI_READERS]
+    if len(set(devices)) != len(devices):
+        raise ValueError(f"Reader SPI bus and device pairs must be unique, got {devices}")
+    return readers
+
+
+class ReaderSession:
+    # What one reader and its screen are doing; the API workers, poller and journal are shared by all readers.
+    # Every screen is a KioskState, and the timers of a state are cancelled as soon as it is left, so a dwell or
+    # timeout can never fire into the next student's screen.
+    def __init__(self, app: "App", reader: ReaderConfig, gui: AppGui, ready_event: threading.Event):
+        self.app = app
+        self.reader = reader
+        self.gui = gui
+        self.ready_event = ready_event
+        self.logger = logging.getLogger(f"READER_{reader.id.upper()}")
+        self.timers = Timers(gui.root)
+
+        self.state = KioskState.WAITING
+        self.workstation_store: list[Workstation] = []
+        self.current_card: int | None = None
+        self.scan_started: float | None = None
+        self.awaiting_seats = False # a refresh asked for by the last scan has not answered yet
+        self.pending_student: str | None = None # waiting on that refresh to show the room map
+        self.answered: Message | None = None # the lookup answer the screen acted on for the current card
+
+        self.handlers = {
+            MessageType.RESET: self.on_reset,
+            MessageType.CANCEL_SEAT_SELECTION: self.on_cancel_seat_selection,
+            MessageType.SCREEN_TAPPED: self.on_screen_tapped,
+            MessageType.CARD_SCANNED: self.on_card_scanned,
+            MessageType.API_STUDENT_NOT_FOUND: self.on_student_not_found,
+            MessageType.API_STUDENT_REQUIRES_RENEWAL: self.on_student_requires_renewal,
+            MessageType.API_CARD_ASSIGNING: self.on_card_assigning,
+            MessageType.API_NO_ACTIVE_ENTRY: self.on_no_active_entry,
+            MessageType.API_ACTIVE_ENTRY_FOUND: self.on_active_entry_found,
+            MessageType.API_WORKSTATION_UPDATE: self.on_workstation_update,
+            MessageType.WORKSTATION_CLICKED: self.on_workstation_clicked,
+            MessageType.API_CACHE_CORRECTION: self.on_cache_correction,
+            MessageType.API_UNAVAILABLE: self.on_api_unavailable,
+            MessageType.API_ERROR: self.on_api_error,
+        }
+
+    @property
+    def sound_player(self) -> sounds.SoundPlayer:
+        return self.app.sound_players[self.reader.buzzer_pin]
+
+    def dispatch(self, msg: Message):
+        if msg.card_id is not None and msg.card_id != self.current_card:
+            self.logger.debug("Dropping %s for a card that already left the reader.", msg.type)
+            return
+        if msg.card_id is not None and self.state != KioskState.LOOKUP and msg.type != MessageType.API_CACHE_CORRECTION:
+            self.logger.debug("Dropping %s, the lookup it answers is over.", msg.type)
+            return
+
+        handler = self.handlers.get(msg.type)
+        if handler is not None:
+            start = time.perf_counter()
+            handler(msg)
+            metrics.DISPATCH_SECONDS.observe(time.perf_counter() - start, msg.type.name)
+        if msg.type in SCAN_ANSWERS and msg.card_id is not None:
+            self.answered = msg
+        if msg.type in SCAN_ANSWERS and self.scan_started is not None:
+            self.observe_scan_answer(msg.type, self.scan_started)
+            self.scan_started = None
+
+    def observe_scan_answer(self, outcome: MessageType, scanned_at: float):
+        # Runs after the redraw queued by the handler, so the time includes painting the answer
+        self.gui.root.after_idle(lambda: metrics.SCAN_TO_SCREEN_SECONDS.observe(time.monotonic() - scanned_at,
+                                                                                outcome.name))
+
+    def enter(self, state: KioskState):
+        self.timers.cancel_all()
+        self.pending_student = None
+        if state != self.state:
+            self.logger.debug("%s -> %s", self.state.name, state.name)
+        self.state = state
+        # The reader is only read where a card is welcome, a card read over a result replaces it
+        if state in READING_STATES:
+            self.ready_event.set()
+        else:
+            self.ready_event.clear()
+
+    def show_result(self, show: Callable[[], None], sound: sounds.Sound, dwell_ms: int):
+        show()
+        self.sound_player.play(sound)
+        self.enter(KioskState.SHOWING_RESULT)
+        self.timers.schedule("dwell", dwell_ms, self.back_to_waiting)
+
+    def show_failure(self, show: Callable[[], None]):
+        self.show_result(show, sounds.WRONG, ERROR_DWELL_MS)
+
+    def stale_for(self) -> float | None:
+        age = self.app.workstation_poller.age()
+        return age if age > WORKSTATION_FRESH_SECONDS else None
+
+    def show_room_map(self, student_id: str):
+        if self.workstation_store is None:
+            self.show_failure(self.show_seat_map_unavailable)
+            return
+        self.gui.show_room_map(self.workstation_store, student_id, self.stale_for())
+        self.enter(KioskState.CHOOSING_SEAT)
+        self.timers.schedule("seat choice", SEAT_CHOICE_TIMEOUT_MS, self.back_to_waiting)
+
+    def show_seat_map_unavailable(self):
+        self.gui.show_error("Seat map unavailable")
+
+    def back_to_waiting(self):
+        self.gui.show_waiting()
+        if "first screen drawn" not in self.app.milestones:
+            self.gui.root.after_idle(lambda: self.app.startup_milestone("first screen drawn"))
+        self.current_card = None
+        self.scan_started = None
+        self.enter(KioskState.WAITING)
+
+    def on_reset(self, msg: Message): # Payload: None
+        self.back_to_waiting()
+
+    def on_cancel_seat_selection(self, msg: Message): # Payload: None
+        if self.state == KioskState.CHOOSING_SEAT:
+            self.back_to_waiting()
+
+    def on_screen_tapped(self, msg: Message): # Tap to skip the rest of a result's dwell. Payload: None
+        if self.state == KioskState.SHOWING_RESULT:
+            self.back_to_waiting()
+
+    def on_card_scanned(self, msg: Message): # Payload: card_id
+        if self.state not in READING_STATES:
+            self.logger.debug("Ignoring a card read while %s.", self.state.name)
+            return
+        # Only another student preempts a result, the same card again would undo what it just did
+        if self.state == KioskState.SHOWING_RESULT and msg.payload == self.current_card:
+            self.logger.debug("Ignoring a repeated read of the card on screen.")
+            return
+        self.current_card = msg.payload
+        self.scan_started = msg.created_at
+        self.answered = None
+        self.gui.show_loading()
+        self.app.api_events.put(ApiJob(ApiJobType.FETCH_ACTIVE_ENTRY, msg.payload,
+                                       deadline=time.monotonic() + FETCH_DEADLINE, reader_id=self.reader.id))
+        self.sound_player.play(sounds.BEEP)
+        self.enter(KioskState.LOOKUP)
+        # Runs alongside the lookup, so a student who needs a seat gets current availability
+        self.awaiting_seats = self.app.workstation_poller.refresh()
+        # An answer that missed its deadline is dropped by the workers, so the lookup gives up on its own
+        self.timers.schedule("lookup", (FETCH_DEADLINE + 1) * 1000,
+                             lambda: self.show_failure(lambda: self.gui.show_error("Unknown Error")))
+
+    def on_student_not_found(self, msg: Message): # Payload: None
+        self.show_failure(self.gui.show_student_not_found)
+
+    def on_student_requires_renewal(self, msg: Message): # Payload: None
+        self.show_failure(self.gui.show_student_requires_renewal)
+
+    def on_card_assigning(self, msg: Message): # Payload: None
+        self.show_failure(self.gui.show_card_assigning)
+
+    def on_no_active_entry(self, msg: Message): # Show room map. Payload: student_id
+        if not self.awaiting_seats:
+            self.show_room_map(msg.payload)
+            return
+        # The refresh is still out, keep the loading screen a little longer and then show what we have
+        self.pending_student = msg.payload
+        self.timers.schedule("fresh seats", WORKSTATION_REFRESH_WAIT_MS, lambda: self.show_room_map(msg.payload))
+
+    def on_active_entry_found(self, msg: Message): # Close entry. Payload: entry_id
+        self.app.api_events.put(ApiJob(ApiJobType.CLOSE_ENTRY, {"entry_id": msg.payload, "card_id": self.current_card},
+                                       reader_id=self.reader.id))
+        self.app.workstation_poller.nudge()
+        self.show_result(self.gui.show_entry_closed, sounds.PLING, RESULT_DWELL_MS)
+
+    def on_workstation_update(self, msg: Message): # Payload: list[Workstation]
+        self.awaiting_seats = False
+        self.workstation_store = msg.payload
+        self.gui.update_room_map(self.workstation_store, self.stale_for())
+        # Without occupancy data only seat choice stops, check-outs and the journal carry on through an outage
+        if self.workstation_store is None and self.state == KioskState.CHOOSING_SEAT:
+            self.show_failure(self.show_seat_map_unavailable)
+        elif self.pending_student is not None:
+            self.show_room_map(self.pending_student)
+
+    def on_workstation_clicked(self, msg: Message): # Reserve seat. Payload = ws_id, ws_name, student_id
+        if self.state != KioskState.CHOOSING_SEAT:
+            return
+        self.app.api_events.put(ApiJob(ApiJobType.ADD_ENTRY, msg.payload, reader_id=self.reader.id))
+        self.app.workstation_poller.nudge()
+        self.show_result(lambda: self.gui.show_seat_reserved(msg.payload["ws_name"]), sounds.PLING, RESULT_DWELL_MS)
+
+    def on_cache_correction(self, msg: Message): # Cached answer was stale. Payload: Message
+        # Same outcome and payload as what the screen already acted on, nothing to redo
+        if msg.payload == self.answered:
+            self.logger.debug("Ignoring a correction that matches the answer on screen.")
+            return
+        # Back to the lookup, so the real answer replaces whatever the cached one put on screen
+        self.enter(KioskState.LOOKUP)
+        self.app.events.put(msg.payload)
+
+    def on_api_unavailable(self, msg: Message): # Circuit breaker is open. Payload: None
+        if self.state not in BUSY_STATES or msg.card_id is not None:
+            self.show_failure(self.gui.show_service_unavailable)
+
+    def on_api_error(self, msg: Message): # Payload: None
+        # Errors of a write job answer no lookup, they wait until no student is in the middle of a lookup or seat choice
+        if self.state not in BUSY_STATES or msg.card_id is not None:
+            self.show_failure(lambda: self.gui.show_error("Unknown Error"))
+
+
 class App:
     def __init__(self):
-        logging.basicConfig(level=logging.DEBUG if "--debug" in sys.argv else logging.INFO,
-                            format='%(asctime)s [%(name)s] - %(levelname)s - %(message)s',
-                            datefmt="%H:%M:%S",
-                            handlers=[
-                                logging.StreamHandler(),
-                                RotatingFileHandler(
-                                    LOG_FILE,
-                                    maxBytes=10 * 1024 * 1024,
-                                    backupCount=7,
-                                    encoding="utf-8",
-                                ),
-                            ])
+        self.profile = StartupProfile()
+        self.profile.mark("imports done")
+        self.log_writer = logs.setup_logging(logging.DEBUG if "--debug" in sys.argv else logging.INFO, LOG_FILE,
+                                             LOG_FORMAT)
+        atexit.register(self.log_writer.stop)
         self.logger = logging.getLogger("LEMAC")
         self.logger.info("Initializing LEMAC Application")
+        # Signal handlers can only be installed from the main thread
+        self.profiler = profiler.Profiler(PROFILE_DIR, PROFILE_SECONDS, version=VERSION)
+        self.profiler.install_signal()
 
-        self.events = queue.Queue()
-        self.api_events = queue.Queue()
+        self.events = WakeupQueue()
+        self.api_events = ApiJobQueue()
         self.stop_event = threading.Event()
-        self.ready_event = threading.Event()
-
-        self.root = tk.Tk()
-        self.gui = AppGui(self.root, self.events, self.stop_event, self.ready_event, VERSION)
+        self.readers = reader_configs()
+        self.ready_events = {reader.id: threading.Event() for reader in self.readers}
+        self.logger.info(f"Driving {len(self.readers)} reader(s): {', '.join(reader.id for reader in self.readers)}")
 
-        self.api_worker = ApiWorker(self.events, self.api_events, self.stop_event)
+        # Network warm-up, the first poll and hardware init run while Tk builds the GUI
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="Boot") as boot:
+            services = boot.submit(self.start_services)
+            hardware = boot.submit(self.start_hardware)
+            with self.profile.phase("create Tk root"):
+                self.root = tk.Tk()
+            with self.profile.phase("build GUI"):
+                self.sessions: dict[str, ReaderSession] = {}
+                for reader in self.readers:
+                    # The first reader gets the root window, every other one a window of its own
+                    window = self.root if not self.sessions else tk.Toplevel(self.root)
+                    gui = AppGui(window, self.events, self.stop_event, self.ready_events[reader.id], VERSION,
+                                 reader.id, reader.geometry)
+                    self.sessions[reader.id] = ReaderSession(self, reader, gui, self.ready_events[reader.id])
+                self.default_session = self.sessions[self.readers[0].id]
+            services.result()
+            hardware.result()
+        self.profile.mark("boot threads done")
 
-        self.workstation_store: list[Workstation] = []
-        self.workstation_poller = WorkstationPoller(self.events, self.stop_event, 5)
+        self.wakeup_enabled = False
+        self.dispatch_count = 0
+        self.dispatch_total_ms = 0.0
+        self.dispatch_max_ms = 0.0
+        self.milestones: set[str] = set()
+        self.startup_reported = False
 
-        self.card_reader = CardScanner(self.events, self.stop_event, self.ready_event)
+    def start_services(self):
+        # Imported here so requests and the API clients load in parallel with Tk
+        with self.profile.phase("import API clients"):
+            from api_clients.ApiWorker import ApiWorkerPool
+            from api_clients.journal import EntryJournal, JournalReplayer
+            from api_clients.workstations import WorkstationPoller
 
-        self.out_of_service = False
+        with self.profile.phase("open journal"):
+            self.journal = EntryJournal(JOURNAL_FILE)
+        self.journal_replayer = JournalReplayer(self.stop_event, self.journal)
+        self.api_worker = ApiWorkerPool(self.events, self.api_events, self.stop_event, self.journal,
+                                        self.journal_replayer, API_WORKERS)
+        self.workstation_poller = WorkstationPoller(self.events, self.stop_event, 5, stream_endpoint=WORKSTATION_STREAM,
+                                                    fresh_for=WORKSTATION_FRESH_SECONDS)
 
-    def start(self):
         self.workstation_poller.start()
+        self.journal_replayer.start()
         self.api_worker.start()
-        self.card_reader.start()
 
-        self.root.after(1000, lambda: self.events.put(Message(MessageType.RESET)))
+        metrics.EVENT_QUEUE_DEPTH.set_function(self.events.qsize)
+        metrics.API_QUEUE_DEPTH.set_function(self.api_events.qsize)
+        metrics.JOURNAL_PENDING.set_function(self.journal.pending_count)
+        metrics.LOG_RECORDS_DROPPED.set_function(logs.dropped_records)
+        if METRICS_PORT:
+            metrics.MetricsServer(self.stop_event, METRICS_PORT).start()
+        if METRICS_TEXTFILE:
+            metrics.MetricsTextfileWriter(self.stop_event, METRICS_TEXTFILE).start()
+        profiler.Watchdog(self.stop_event).start()
+        if PROFILE_SOCKET:
+            profiler.ProfilerServer(self.stop_event, PROFILE_SOCKET, self.profiler).start()
+
+    def start_hardware(self):
+        # The buzzer goes first: it puts GPIO in BCM mode, which the card reader then follows
+        with self.profile.phase("import hardware drivers"):
+            from pi.card_reader import CardScanner
+            from pi.readers import create_backend
+
+        with self.profile.phase("init buzzer"):
+            # Readers without a buzzer pin of their own share the default one
+            pins = dict.fromkeys(reader.buzzer_pin for reader in self.readers)
+            self.sound_players = {
+                pin: sounds.SoundPlayer(self.stop_event, sounds.create_backend(sounds.BUZZER_PIN if pin is None else pin))
+                for pin in pins
+            }
+        with self.profile.phase("init card reader"):
+            self.card_readers = [
+                CardScanner(self.events, self.stop_event, self.ready_events[reader.id],
+                            create_backend(reader.card_reader, self.stop_event, reader.irq_pin, reader.source,
+                                           CARD_REPLAY_SPEED, reader.spi_bus, reader.spi_device),
+                            reader_id=reader.id)
+                for reader in self.readers
+            ]
 
+        for sound_player in self.sound_players.values():
+            sound_player.start()
+        for card_reader in self.card_readers:
+            card_reader.start()
+
+    def start(self):
+        self.events.put(Message(MessageType.RESET))
+        self.root.after(STARTUP_REPORT_TIMEOUT, self.report_startup)
+        self.heartbeat()
+
+        # Producer threads wake the Tk loop through the queue's pipe instead of a 100 ms poll
+        try:
+            self.root.tk.createfilehandler(self.events.read_fd, tk.READABLE,
+                                           lambda fd, mask: self.process_events())
+            self.wakeup_enabled = True
+        except (AttributeError, tk.TclError):
+            self.logger.warning("Tk file handlers are not supported, falling back to polling the event queue.")
         self.root.after(0, self.process_events)
 
         self.logger.info("All systems go. Starting main loop.")
         self.root.mainloop()
+        # Closing any reader's window stops the whole app
+        self.stop_event.set()
+        for ready_event in self.ready_events.values():
+            ready_event.set()
+        try:
+            self.root.destroy()
+        except tk.TclError:
+            pass
+
+        if self.dispatch_count:
+            self.logger.info(f"Dispatched {self.dispatch_count} events, queue latency "
+                             f"avg={self.dispatch_total_ms / self.dispatch_count:.1f}ms max={self.dispatch_max_ms:.1f}ms")
+        for session in self.sessions.values():
+            for line in session.gui.frame_timer.report():
+                self.logger.info(f"Screen transitions {session.reader.id} {line}")
+
+    def heartbeat(self):
+        profiler.HEARTBEATS.beat(HEARTBEAT_MS / 1000 + 1)
+        self.root.after(HEARTBEAT_MS, self.heartbeat)
+
+    def startup_milestone(self, name: str):
+        if name in self.milestones:
+            return
+        self.milestones.add(name)
+        self.profile.mark(name)
+        if STARTUP_MILESTONES <= self.milestones:
+            self.report_startup()
+
+    def report_startup(self):
+        if self.startup_reported or "--startup-profile" not in sys.argv:
+            return
+        self.startup_reported = True
+        self.logger.info("Startup profile:")
+        for line in self.profile.report():
+            self.logger.info(line)
+
+    def route(self, msg: Message) -> list[ReaderSession]:
+        if msg.reader_id is None:
+            return list(self.sessions.values()) if msg.type in BROADCAST else [self.default_session]
+        session = self.sessions.get(msg.reader_id)
+        if session is None:
+            self.logger.warning(f"Dropping {msg.type} for unknown reader {msg.reader_id}.")
+            return []
+        return [session]
 
     def process_events(self):
+        self.events.clear_wakeups()
         try:
             while True:
                 msg: Message = self.events.get_nowait()
 
-                if self.out_of_service and msg.type != MessageType.API_WORKSTATION_UPDATE:
-                    continue
-
-                if msg.type == MessageType.RESET or msg.type == MessageType.CANCEL_SEAT_SELECTION: # Reset
-                    self.gui.show_waiting()
-                    self.ready_event.set()
-                elif msg.type == MessageType.CARD_SCANNED: # Card scanned. Payload: card_id
-                    self.ready_event.clear()
-                    self.gui.show_loading()
-                    self.api_events.put(ApiJob(ApiJobType.FETCH_ACTIVE_ENTRY, msg.payload))
-                    thread = threading.Thread(target=sounds.beep)
-                    thread.start()
-                elif msg.type == MessageType.API_STUDENT_NOT_FOUND: # Student not found. Payload: None
-                    self.gui.show_student_not_found()
-                    thread = threading.Thread(target=sounds.wrong)
-                    thread.start()
-                    self.root.after(3000, lambda: self.events.put(Message(MessageType.RESET)))
-                elif msg.type == MessageType.API_STUDENT_REQUIRES_RENEWAL: # Student not found. Payload: None
-                    self.gui.show_student_requires_renewal()
-                    thread = threading.Thread(target=sounds.wrong)
-                    thread.start()
-                    self.root.after(3000, lambda: self.events.put(Message(MessageType.RESET)))
-                elif msg.type == MessageType.API_CARD_ASSIGNING: # Card assigning. Payload: None
-                    self.gui.show_card_assigning()
-                    thread = threading.Thread(target=sounds.wrong)
-                    thread.start()
-                    self.root.after(3000, lambda: self.events.put(Message(MessageType.RESET)))
-                elif msg.type == MessageType.API_NO_ACTIVE_ENTRY: # Show room map. Payload: student_id
-                    self.gui.show_room_map(self.workstation_store, msg.payload)
-                elif msg.type == MessageType.API_ACTIVE_ENTRY_FOUND: # Close entry. Payload: entry_id
-                    self.api_events.put(ApiJob(ApiJobType.CLOSE_ENTRY, msg.payload))
-                    self.gui.show_entry_closed()
-                    thread = threading.Thread(target=sounds.pling)
-                    thread.start()
-                    self.root.after(3000, lambda: self.events.put(Message(MessageType.RESET)))
-                elif msg.type == MessageType.API_WORKSTATION_UPDATE: # Workstation data update. Payload: list[Workstation]
-                    self.workstation_store = msg.payload
-                    if self.workstation_store is None and not self.out_of_service:
-                        self.out_of_service = True
-                        self.gui.show_error("Out of Service")
-                        thread = threading.Thread(target=sounds.wrong)
-                        thread.start()
-                    elif self.workstation_store is not None and self.out_of_service:
-                        self.out_of_service = False
-                        self.events.put(Message(MessageType.RESET))
-                elif msg.type == MessageType.WORKSTATION_CLICKED: # Reserve seat. Payload = ws_id, ws_name, student_id
-                    self.gui.show_loading()
-                    self.api_events.put(ApiJob(ApiJobType.ADD_ENTRY, msg.payload))
-                    self.gui.show_seat_reserved(msg.payload["ws_name"])
-                    thread = threading.Thread(target=sounds.pling)
-                    thread.start()
-                    self.root.after(3000, lambda: self.events.put(Message(MessageType.RESET)))
-                elif msg.type == MessageType.API_ERROR:
-                    self.gui.show_error("Unknown Error")
-                    thread = threading.Thread(target=sounds.wrong)
-                    thread.start()
-                    self.root.after(3000, lambda: self.events.put(Message(MessageType.RESET)))
-
-
+                latency_ms = (time.monotonic() - msg.created_at) * 1000
+                self.dispatch_count += 1
+                self.dispatch_total_ms += latency_ms
+                self.dispatch_max_ms = max(self.dispatch_max_ms, latency_ms)
+                metrics.EVENT_QUEUE_SECONDS.observe(latency_ms / 1000, msg.type.name)
+                self.logger.debug("Dispatching %s to %s after %.1fms in queue", msg.type, msg.reader_id or "all", latency_ms)
 
+                if msg.type == MessageType.API_WORKSTATION_UPDATE:
+                    self.startup_milestone("first workstation update")
+                for session in self.route(msg):
+                    session.dispatch(msg)
         except queue.Empty:
             pass
-        self.root.after(100, self.process_events)
+        if not self.wakeup_enabled:
+            self.root.after(100, self.process_events)
 
-app = App()
-app.start()
\ No newline at end of file
+if __name__ == "__main__":
+    app = App()
+    app.start()
@@ -0,0 +1,29 @@
+import os
+import queue
+
+
+class WakeupQueue(queue.Queue):
+    # A queue whose puts also write a byte to a pipe, so a select()-based loop (Tk) can wake up on them
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        os.set_blocking(self.write_fd, False)
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        try:
+            os.write(self.write_fd, b"\0")
+        except BlockingIOError:
+            pass # The pipe is full, so the consumer is already due to wake up
+
+    def clear_wakeups(self):
+        try:
+            while os.read(self.read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
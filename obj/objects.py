@@ -1,13 +1,38 @@
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any
 
 
+@dataclass(frozen=True)
+class ReaderConfig:
+    id: str
+    card_reader: str
+    spi_bus: int = 0
+    spi_device: int = 0
+    irq_pin: int | None = None
+    source: str | None = None # socket/FIFO path or scan log of a virtual reader
+    buzzer_pin: int | None = None
+    geometry: str | None = None # Tk geometry of the reader's screen, WIDTHxHEIGHT+X+Y or +X+Y
+
+    @classmethod
+    def from_dict(cls, d: dict, defaults: "ReaderConfig") -> "ReaderConfig":
+        return cls(
+            id=str(d["id"]),
+            card_reader=d.get("card_reader", defaults.card_reader),
+            spi_bus=d.get("spi_bus", defaults.spi_bus),
+            spi_device=d.get("spi_device", defaults.spi_device),
+            irq_pin=d.get("irq_pin", defaults.irq_pin),
+            source=d.get("source", defaults.source),
+            buzzer_pin=d.get("buzzer_pin", defaults.buzzer_pin),
+            geometry=d.get("geometry", defaults.geometry),
+        )
+
 class WorkstationType(Enum):
     LAPTOP = "LAPTOP"
     DESKTOP = "DESKTOP"
 
-@dataclass
+@dataclass(slots=True)
 class Workstation:
     id: int
     name: str
@@ -30,13 +55,25 @@ class MessageType(Enum):
     API_STUDENT_REQUIRES_RENEWAL = "api_student_requires_renewal"  # payload = None
     API_CARD_ASSIGNING = "api_card_assigning" # payload = None
     API_NO_ACTIVE_ENTRY = "api_no_active_entry" # payload = student_id: str
-    API_ACTIVE_ENTRY_FOUND = "api_active_entry_found" # payload = entry_id: int
+    API_ACTIVE_ENTRY_FOUND = "api_active_entry_found" # payload = entry_id: int | None (None if only known locally)
     API_WORKSTATION_UPDATE = "api_workstation_update" # payload = list[Workstation]
     WORKSTATION_CLICKED = "workstation_clicked" # payload = ws_id: int, ws_name: str, student_id: str
     CANCEL_SEAT_SELECTION = "cancel_seat_selection" # payload = None
+    API_CACHE_CORRECTION = "api_cache_correction" # payload = Message
+    API_UNAVAILABLE = "api_unavailable" # payload = None
     API_ERROR = "api_error" # payload = None
+    SCREEN_TAPPED = "screen_tapped" # payload = None
+
+class KioskState(Enum):
+    WAITING = "waiting"
+    LOOKUP = "lookup" # card read, waiting for the API
+    CHOOSING_SEAT = "choosing_seat"
+    SHOWING_RESULT = "showing_result"
 
 @dataclass(frozen=True)
 class Message:
     type: MessageType
-    payload: Any = None
\ No newline at end of file
+    payload: Any = None
+    card_id: int | None = field(default=None, compare=False) # card whose API lookup produced this message
+    reader_id: str | None = field(default=None, compare=False) # reader session this message belongs to, None for all
+    created_at: float = field(default_factory=time.monotonic, compare=False, repr=False)
\ No newline at end of file
@@ -1,15 +1,15 @@
 import logging
 import queue
 import threading
+import time
 from enum import Enum
 
-try:
-    from mfrc522 import SimpleMFRC522
-    HAS_HARDWARE = True
-except ImportError:
-    HAS_HARDWARE = False
-
+from config import CARD_DEBOUNCE_MS
+from diagnostics.profiler import HEARTBEATS
 from obj.objects import Message, MessageType
+from pi.readers import CardReaderBackend
+
+READ_DEADLINE = 5 # s a 0.5 s read may take, reinitializing the reader included
 
 class CardScanned(Enum):
     NOT_SCANNED = 0
@@ -19,41 +19,58 @@ class CardScanned(Enum):
     LOADING = 4
 
 class CardScanner(threading.Thread):
-    def __init__(self, events: queue.Queue, stop_event: threading.Event, ready_event: threading.Event):
-        super().__init__()
+    def __init__(self, events: queue.Queue, stop_event: threading.Event, ready_event: threading.Event,
+                 backend: CardReaderBackend | None, debounce_ms: int = CARD_DEBOUNCE_MS,
+                 reader_id: str | None = None):
+        super().__init__(name=f"CardScanner-{reader_id}" if reader_id else None)
         self.logger = logging.getLogger("CARD_SCANNER")
         self.logger.info(f"Starting Card Scanner...")
         self.events = events
         self.stop_event = stop_event
         self.ready_event = ready_event
-        if HAS_HARDWARE:
-            self.reader = SimpleMFRC522()
-        else:
-            self.logger.warning("mfrc522 hardware not found. CardScanner will be disabled.")
-
+        self.debounce = debounce_ms / 1000
+        self.reader_id = reader_id
+        self.last_card: int | None = None
+        self.last_seen = 0.0
+        self.backend = backend # None when create_backend disabled the reader
 
     def run(self):
-        if not HAS_HARDWARE:
+        if self.backend is None:
             return
 
         while not self.stop_event.is_set():
-            self.ready_event.wait()
+            if not self.ready_event.is_set():
+                # Parked for as long as the screen takes no cards, which is not a stall
+                HEARTBEATS.idle()
+                self.ready_event.wait()
+                # The card that was just answered may still be on the reader, its debounce restarts from here
+                self.last_seen = time.monotonic()
             if self.stop_event.is_set():
                 break
+            HEARTBEATS.beat(READ_DEADLINE)
 
             try:
-                card_id = self.reader.read_id_no_block()
+                card_id = self.backend.read_id(0.5)
 
                 if card_id:
                     if card_id > 0xFFFFFFFF:
                         card_id = card_id >> 8
-                    self.events.put(Message(MessageType.CARD_SCANNED, card_id))
-                    self.logger.info(f"Scanned card ID: {card_id}")
-                    self.stop_event.wait(0.7)
-                else:
-                    self.stop_event.wait(0.05)
+                    self.on_card(card_id)
             except Exception as e:
                 self.logger.error(f"Card read failed: {e}")
-                self.reader = SimpleMFRC522()
+                self.backend.reset()
                 self.logger.error("Reinitialized card reader after failure.")
-        self.logger.info("CardScanner stopped.")
\ No newline at end of file
+        self.backend.close()
+        self.logger.info("CardScanner stopped.")
+
+    def on_card(self, card_id: int):
+        # The same card is ignored until it has been away from the reader for the debounce time,
+        # a different card is accepted at once
+        now = time.monotonic()
+        repeated = card_id == self.last_card and now - self.last_seen < self.debounce
+        self.last_card = card_id
+        self.last_seen = now
+        if repeated:
+            return
+        self.events.put(Message(MessageType.CARD_SCANNED, card_id, reader_id=self.reader_id))
+        self.logger.info(f"Scanned card ID: {card_id}")
@@ -0,0 +1,261 @@
+import logging
+import os
+import queue
+import re
+import socket
+import stat
+import sys
+import threading
+import time
+from datetime import datetime
+
+try:
+    from mfrc522 import SimpleMFRC522, MFRC522
+    HAS_HARDWARE = True
+except ImportError:
+    HAS_HARDWARE = False
+
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    GPIO = None
+
+# MFRC522 registers and commands used to arm the receive interrupt
+COMM_IEN_REG = 0x02
+COMM_IRQ_REG = 0x04
+FIFO_DATA_REG = 0x09
+COMMAND_REG = 0x01
+BIT_FRAMING_REG = 0x0D
+IRQ_PUSH_PULL_RX = 0xA0
+CLEAR_IRQS = 0x7F
+START_SEND_7_BITS = 0x87
+
+
+class CardReaderBackend:
+    # Returns the raw card id, or None if no card showed up within timeout seconds
+    def read_id(self, timeout: float) -> int | None:
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PollingBackend(CardReaderBackend):
+    def __init__(self, stop_event: threading.Event, poll_interval: float = 0.05, spi_bus: int = 0, spi_device: int = 0):
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.spi_bus = spi_bus
+        self.spi_device = spi_device
+        self.reader = open_reader(spi_bus, spi_device)
+
+    def read_id(self, timeout: float) -> int | None:
+        card_id = self.reader.read_id_no_block()
+        if card_id:
+            return card_id
+        self.stop_event.wait(min(self.poll_interval, timeout))
+        return None
+
+    def reset(self):
+        self.reader = open_reader(self.spi_bus, self.spi_device)
+
+
+class IrqBackend(PollingBackend):
+    # Sleeps on the MFRC522 IRQ line instead of polling over SPI. A REQA is re-armed every
+    # rearm_interval because the chip only raises the IRQ when a card answers one.
+    def __init__(self, stop_event: threading.Event, irq_pin: int, rearm_interval: float = 0.1, spi_bus: int = 0,
+                 spi_device: int = 0):
+        super().__init__(stop_event, spi_bus=spi_bus, spi_device=spi_device)
+        self.irq_pin = irq_pin
+        self.rearm_interval = rearm_interval
+        GPIO.setup(self.irq_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self._enable_irq()
+
+    def read_id(self, timeout: float) -> int | None:
+        self._arm()
+        channel = GPIO.wait_for_edge(self.irq_pin, GPIO.FALLING, timeout=int(min(self.rearm_interval, timeout) * 1000))
+        if channel is None:
+            return None
+        card_id = self.reader.read_id_no_block()
+        self._enable_irq()
+        return card_id or None
+
+    def reset(self):
+        super().reset()
+        self._enable_irq()
+
+    def close(self):
+        GPIO.cleanup(self.irq_pin)
+
+    def _enable_irq(self):
+        self.reader.READER.Write_MFRC522(COMM_IEN_REG, IRQ_PUSH_PULL_RX)
+
+    def _arm(self):
+        self.reader.READER.Write_MFRC522(COMM_IRQ_REG, CLEAR_IRQS)
+        self.reader.READER.Write_MFRC522(FIFO_DATA_REG, MFRC522.PICC_REQIDL)
+        self.reader.READER.Write_MFRC522(COMMAND_REG, MFRC522.PCD_TRANSCEIVE)
+        self.reader.READER.Write_MFRC522(BIT_FRAMING_REG, START_SEND_7_BITS)
+
+
+class SimulatedBackend(CardReaderBackend):
+    # Card ids are fed programmatically, for tests and development machines without a reader.
+    # Cards fed while the kiosk is busy wait their turn, like a student at the door.
+    def __init__(self):
+        self.cards: queue.Queue[int] = queue.Queue()
+
+    def feed(self, card_id: int):
+        self.cards.put(card_id)
+
+    def read_id(self, timeout: float) -> int | None:
+        try:
+            return self.cards.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class StreamBackend(SimulatedBackend):
+    # Reads one card id per line, decimal or 0x-prefixed hex, from a Unix socket, a FIFO or stdin
+    def __init__(self, stop_event: threading.Event, kind: str, source: str | None):
+        super().__init__()
+        self.logger = logging.getLogger("CARD_SCANNER")
+        self.stop_event = stop_event
+        self.kind = kind
+        self.source = source
+        self.server: socket.socket | None = None
+        if kind == "socket":
+            self.server = self._listen(source)
+        elif kind == "fifo" and not os.path.exists(source):
+            os.mkfifo(source)
+        threading.Thread(target=self._read_source, name=f"VirtualReader-{kind}", daemon=True).start()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            os.unlink(self.source)
+
+    def _listen(self, path: str) -> socket.socket:
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen()
+        server.settimeout(0.5)
+        return server
+
+    def _read_source(self):
+        self.logger.info(f"Virtual card reader listening on {self.kind} {self.source or ''}".rstrip())
+        while not self.stop_event.is_set():
+            try:
+                if self.kind == "socket":
+                    try:
+                        conn, _ = self.server.accept()
+                    except socket.timeout:
+                        continue
+                    with conn, conn.makefile("r") as lines:
+                        self._feed_lines(lines)
+                elif self.kind == "fifo":
+                    # Blocks until a writer opens the FIFO, and hits EOF when the last one closes it
+                    with open(self.source) as lines:
+                        self._feed_lines(lines)
+                else:
+                    self._feed_lines(sys.stdin)
+                    return
+            except OSError as err:
+                if self.stop_event.is_set():
+                    return
+                self.logger.error(f"Virtual card reader failed: {err}")
+                self.stop_event.wait(1)
+
+    def _feed_lines(self, lines):
+        for line in lines:
+            card_id = parse_card_id(line)
+            if card_id is not None:
+                self.feed(card_id)
+
+
+class ReplayBackend(SimulatedBackend):
+    # Replays a scan log with its original timing. Lines are either "<seconds> <card id>" or
+    # this app's own log lines, so a day at the door can be replayed from reader.log.
+    def __init__(self, stop_event: threading.Event, path: str, speed: float = 1):
+        super().__init__()
+        self.logger = logging.getLogger("CARD_SCANNER")
+        self.stop_event = stop_event
+        self.scans = load_scan_log(path)
+        self.speed = speed
+        threading.Thread(target=self._replay, name="VirtualReader-replay", daemon=True).start()
+
+    def _replay(self):
+        self.logger.info(f"Replaying {len(self.scans)} scans at {self.speed:g}x")
+        start = time.monotonic()
+        for offset, card_id in self.scans:
+            if self.stop_event.wait(max(start + offset / self.speed - time.monotonic(), 0)):
+                return
+            self.feed(card_id)
+        self.logger.info("Scan replay finished.")
+
+
+def open_reader(spi_bus: int, spi_device: int) -> "SimpleMFRC522":
+    # SimpleMFRC522 always opens /dev/spidev0.0, other chip selects need their own MFRC522
+    if (spi_bus, spi_device) == (0, 0):
+        return SimpleMFRC522()
+    reader = SimpleMFRC522.__new__(SimpleMFRC522)
+    reader.READER = MFRC522(bus=spi_bus, device=spi_device)
+    return reader
+
+
+LOG_SCAN = re.compile(r"^(\d{2}:\d{2}:\d{2}).*Scanned card ID: (\d+)")
+
+
+def parse_card_id(text: str) -> int | None:
+    text = text.strip()
+    if not text or text.startswith("#"):
+        return None
+    try:
+        return int(text, 0)
+    except ValueError:
+        logging.getLogger("CARD_SCANNER").warning(f"Ignoring invalid virtual card id: {text!r}")
+        return None
+
+
+def load_scan_log(path: str) -> list[tuple[float, int]]:
+    scans = []
+    first: datetime | None = None
+    with open(path) as f:
+        for line in f:
+            match = LOG_SCAN.match(line)
+            if match:
+                at = datetime.strptime(match.group(1), "%H:%M:%S")
+                first = first or at
+                # Log lines only carry the time of day, so a replay across midnight wraps around
+                scans.append(((at - first).total_seconds() % 86400, int(match.group(2))))
+                continue
+            fields = line.split()
+            if len(fields) == 2 and not line.startswith("#"):
+                scans.append((float(fields[0]), int(fields[1], 0)))
+    return sorted(scans)
+
+
+def create_backend(kind: str, stop_event: threading.Event, irq_pin: int | None, source: str | None = None,
+                   replay_speed: float = 1, spi_bus: int = 0, spi_device: int = 0) -> CardReaderBackend | None:
+    logger = logging.getLogger("CARD_SCANNER")
+    if kind == "simulated":
+        return SimulatedBackend()
+    if kind in ("socket", "fifo", "replay") and not source:
+        logger.error(f"CARD_READER={kind} needs CARD_READER_SOURCE to be set. CardScanner will be disabled.")
+        return None
+    if kind in ("socket", "fifo", "stdin"):
+        return StreamBackend(stop_event, kind, source)
+    if kind == "replay":
+        return ReplayBackend(stop_event, source, replay_speed)
+    if not HAS_HARDWARE:
+        logger.warning("mfrc522 hardware not found. CardScanner will be disabled, "
+                       "set CARD_READER=socket, fifo or stdin to feed cards without a reader.")
+        return None
+    if kind in ("auto", "irq") and irq_pin is not None and GPIO is not None:
+        try:
+            return IrqBackend(stop_event, irq_pin, spi_bus=spi_bus, spi_device=spi_device)
+        except RuntimeError as err:
+            logger.warning(f"Could not use the reader IRQ line, falling back to polling: {err}")
+    return PollingBackend(stop_event, spi_bus=spi_bus, spi_device=spi_device)
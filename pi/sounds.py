@@ -1,48 +1,146 @@
-from time import sleep
-
-try:
-    import RPi.GPIO as GPIO
-    HAS_HARDWARE = True
-except ImportError:
-    HAS_HARDWARE = False
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
 
 BUZZER_PIN = 14
 FREQUENCY = 2000
 
-if HAS_HARDWARE:
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(BUZZER_PIN, GPIO.OUT)
-    pwm = GPIO.PWM(BUZZER_PIN, FREQUENCY)
+@dataclass(frozen=True)
+class Tone:
+    frequency: int
+    duration: float
+    duty_cycle: float
 
-def beep(duration=0.1):
-    if not HAS_HARDWARE: return
-    pwm.start(80)
-    sleep(duration)
-    pwm.stop()
+Sound = tuple[Tone, ...]
 
-def pling():
-    if not HAS_HARDWARE: return
-    try:
-        pwm.start(50)
+BEEP: Sound = (Tone(FREQUENCY, 0.1, 80),)
+PLING: Sound = tuple(Tone(freq, 0.05, 50) for freq in (1000, 1200, 1400, 1600))
+WRONG: Sound = (
+    Tone(900, 0.06, 70),
+    Tone(700, 0.06, 70),
+    Tone(500, 0.08, 70),
+    Tone(350, 0.10, 70),
+    Tone(180, 0.15, 70),
+)
+
+class BuzzerBackend:
+    def start(self, duty_cycle: float):
+        pass
+
+    def change_frequency(self, frequency: int):
+        pass
+
+    def change_duty_cycle(self, duty_cycle: float):
+        pass
+
+    def stop(self):
+        pass
+
+class PwmBackend(BuzzerBackend):
+    def __init__(self, pin: int = BUZZER_PIN):
+        import RPi.GPIO as GPIO
+
+        self.GPIO = GPIO
+        self.pin = pin
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(pin, GPIO.OUT)
+        self.pwm = GPIO.PWM(pin, FREQUENCY)
+
+    def start(self, duty_cycle: float):
+        self.pwm.start(duty_cycle)
+
+    def change_frequency(self, frequency: int):
+        self.pwm.ChangeFrequency(frequency)
+
+    def change_duty_cycle(self, duty_cycle: float):
+        self.pwm.ChangeDutyCycle(duty_cycle)
+
+    def stop(self):
+        self.pwm.stop()
+        self.GPIO.output(self.pin, self.GPIO.LOW)
+
+class RecordingBackend(BuzzerBackend):
+    # Records what the buzzer would have played, for tests on machines without one
+    def __init__(self):
+        self.timeline: list[tuple[float, str, float | None]] = []
+        self.started_at = time.monotonic()
+
+    def _record(self, action: str, value: float | None = None):
+        self.timeline.append((time.monotonic() - self.started_at, action, value))
+
+    def start(self, duty_cycle: float):
+        self._record("start", duty_cycle)
+
+    def change_frequency(self, frequency: int):
+        self._record("frequency", frequency)
+
+    def change_duty_cycle(self, duty_cycle: float):
+        self._record("duty_cycle", duty_cycle)
+
+    def stop(self):
+        self._record("stop")
+
+class SoundPlayer(threading.Thread):
+    def __init__(self, stop_event: threading.Event, backend: BuzzerBackend | None = None, max_pending: int = 4):
+        super().__init__(name="SoundPlayer", daemon=True)
+        self.logger = logging.getLogger("SOUND_PLAYER")
+        self.stop_event = stop_event
+        self.backend = backend if backend is not None else create_backend()
+        self.sounds: queue.Queue[Sound] = queue.Queue(max_pending)
+        self.cancel_event = threading.Event()
+
+    def play(self, sound: Sound):
+        # A new sound preempts the one playing
+        self.cancel_event.set()
+        while True:
+            try:
+                self.sounds.put_nowait(sound)
+                return
+            except queue.Full:
+                try:
+                    self.sounds.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                sound = self.sounds.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self.cancel_event.clear()
+            # Anything queued behind it is newer, and would preempt it at once
+            while not self.sounds.empty():
+                sound = self.sounds.get_nowait()
+            self._play(sound)
+        self.logger.info("Sound player stopped.")
 
-        for freq in [1000, 1200, 1400, 1600]:
-            pwm.ChangeFrequency(freq)
-            sleep(0.05)
+    def _play(self, sound: Sound):
+        try:
+            frequency = sound[0].frequency
+            duty_cycle = sound[0].duty_cycle
+            self.backend.change_frequency(frequency)
+            self.backend.start(duty_cycle)
+            for tone in sound:
+                if tone.frequency != frequency:
+                    self.backend.change_frequency(tone.frequency)
+                    frequency = tone.frequency
+                if tone.duty_cycle != duty_cycle:
+                    self.backend.change_duty_cycle(tone.duty_cycle)
+                    duty_cycle = tone.duty_cycle
+                if self.cancel_event.wait(tone.duration):
+                    break
+        except Exception as err:
+            self.logger.error(f"Failed to play sound with error: {err}")
+        finally:
+            self.backend.stop()
 
-        pwm.stop()
-    finally:
-        GPIO.output(BUZZER_PIN, GPIO.LOW)
 
-def wrong():
-    if not HAS_HARDWARE: return
+def create_backend(pin: int = BUZZER_PIN) -> BuzzerBackend:
+    # The GPIO driver is only imported here, on a boot thread, main only needs the tones at import time
     try:
-        pwm.start(70)
-        for freq, dur in [(900, 0.06), (700, 0.06), (500, 0.08), (350, 0.10)]:
-            pwm.ChangeFrequency(freq)
-            sleep(dur)
-
-        pwm.ChangeFrequency(180)
-        sleep(0.15)
-        pwm.stop()
-    finally:
-        GPIO.output(BUZZER_PIN, GPIO.LOW)
\ No newline at end of file
+        return PwmBackend(pin)
+    except ImportError:
+        return BuzzerBackend()